@@ -19,7 +19,13 @@ def upgrade() -> None:
         "api_clients",
         sa.Column("distributor_id", sa.String(length=255), nullable=False, server_default=""),
     )
-    op.create_index("ix_api_clients_distributor_id", "api_clients", ["distributor_id"])
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_api_clients_distributor_id",
+            "api_clients",
+            ["distributor_id"],
+            postgresql_concurrently=True,
+        )
 
 
 def downgrade() -> None:
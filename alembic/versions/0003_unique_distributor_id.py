@@ -14,10 +14,19 @@ depends_on = None
 
 
 def upgrade() -> None:
-    op.create_unique_constraint(
-        "uq_api_clients_distributor_id",
-        "api_clients",
-        ["distributor_id"],
+    # Build the unique index without blocking writes, then attach it as the
+    # constraint, which only needs a brief lock.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_api_clients_distributor_id",
+            "api_clients",
+            ["distributor_id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+    op.execute(
+        "ALTER TABLE api_clients ADD CONSTRAINT uq_api_clients_distributor_id "
+        "UNIQUE USING INDEX uq_api_clients_distributor_id"
     )
 
 
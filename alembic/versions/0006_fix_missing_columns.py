@@ -16,11 +16,21 @@ branch_labels = None
 depends_on = None
 
 
+def _existing_columns() -> set[str]:
+    # One information_schema query instead of a full inspector reflection.
+    result = op.get_bind().execute(
+        sa.text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'api_clients' "
+            "AND column_name IN ('distributor_id', 'last_api_key_reset_at')"
+        )
+    )
+    return {row[0] for row in result}
+
+
 def upgrade() -> None:
     # Check if columns exist before adding
-    conn = op.get_bind()
-    inspector = sa.inspect(conn)
-    columns = [col["name"] for col in inspector.get_columns("api_clients")]
+    columns = _existing_columns()
     
     # Add distributor_id if it doesn't exist
     if "distributor_id" not in columns:
@@ -28,7 +38,13 @@ def upgrade() -> None:
             "api_clients",
             sa.Column("distributor_id", sa.String(length=255), nullable=False, server_default=""),
         )
-        op.create_index("ix_api_clients_distributor_id", "api_clients", ["distributor_id"])
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_api_clients_distributor_id",
+                "api_clients",
+                ["distributor_id"],
+                postgresql_concurrently=True,
+            )
     
     # Add last_api_key_reset_at if it doesn't exist
     if "last_api_key_reset_at" not in columns:
@@ -39,9 +55,7 @@ def upgrade() -> None:
 
 
 def downgrade() -> None:
-    conn = op.get_bind()
-    inspector = sa.inspect(conn)
-    columns = [col["name"] for col in inspector.get_columns("api_clients")]
+    columns = _existing_columns()
     
     if "last_api_key_reset_at" in columns:
         op.drop_column("api_clients", "last_api_key_reset_at")
@@ -0,0 +1,38 @@
+"""fold password_salt into password_hash for Argon2id
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing PBKDF2 hashes keep verifying via the legacy branch in
+    # app.auth.verify_password and are rehashed with Argon2id on next login.
+    op.execute(
+        "UPDATE api_clients "
+        "SET password_hash = 'pbkdf2_sha256$200000$' || password_salt || '$' || password_hash"
+    )
+    op.drop_column("api_clients", "password_salt")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "api_clients",
+        sa.Column("password_salt", sa.String(length=255), nullable=False, server_default=""),
+    )
+    # Only legacy hashes can be restored; Argon2id rows need a password reset.
+    op.execute(
+        "UPDATE api_clients "
+        "SET password_salt = split_part(password_hash, '$', 3), "
+        "password_hash = split_part(password_hash, '$', 4) "
+        "WHERE password_hash LIKE 'pbkdf2_sha256$%'"
+    )
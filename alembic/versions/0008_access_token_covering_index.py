@@ -0,0 +1,34 @@
+"""covering index for bearer token lookups
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Lets get_token_client resolve token_sha -> api_client_id from the index alone.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_access_tokens_token_sha_covering",
+            "access_tokens",
+            ["token_sha"],
+            postgresql_include=["api_client_id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_access_tokens_token_sha_covering",
+            table_name="access_tokens",
+            postgresql_concurrently=True,
+        )
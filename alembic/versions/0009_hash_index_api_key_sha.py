@@ -0,0 +1,60 @@
+"""hash index for api key lookups, drop duplicate unique btrees
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Hash indexes cannot be UNIQUE, so api_clients_api_key_sha_key keeps
+    # enforcing uniqueness while equality lookups use the smaller hash index.
+    # The explicit unique indexes from 0001 duplicate the *_key constraints.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_api_clients_api_key_sha_hash",
+            "api_clients",
+            ["api_key_sha"],
+            postgresql_using="hash",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_access_tokens_token_sha",
+            table_name="access_tokens",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_api_clients_email",
+            table_name="api_clients",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_api_clients_email",
+            "api_clients",
+            ["email"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_access_tokens_token_sha",
+            "access_tokens",
+            ["token_sha"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_api_clients_api_key_sha_hash",
+            table_name="api_clients",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,44 @@
+"""store sha256 lookup digests as bytea
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+SHA_COLUMNS = [
+    ("api_clients", "api_key_sha"),
+    ("access_tokens", "token_sha"),
+    ("password_reset_tokens", "token_sha"),
+]
+
+
+def upgrade() -> None:
+    for table_name, column_name in SHA_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            type_=sa.LargeBinary(length=32),
+            existing_type=sa.String(length=64),
+            existing_nullable=False,
+            postgresql_using=f"decode({column_name}, 'hex')",
+        )
+
+
+def downgrade() -> None:
+    for table_name, column_name in SHA_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            type_=sa.String(length=64),
+            existing_type=sa.LargeBinary(length=32),
+            existing_nullable=False,
+            postgresql_using=f"encode({column_name}, 'hex')",
+        )
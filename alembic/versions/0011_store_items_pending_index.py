@@ -0,0 +1,36 @@
+"""partial index for the automation batch scan
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Only un-exported rows are indexed, so polling cost tracks the pending
+    # backlog rather than each client's full history.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_store_items_pending",
+            "store_items",
+            ["api_client_id", "created_at"],
+            postgresql_where=sa.text("is_exported = false"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_store_items_pending",
+            table_name="store_items",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,27 @@
+"""drop api_key_hash, duplicated by api_key_sha
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_column("api_clients", "api_key_hash")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "api_clients",
+        sa.Column("api_key_hash", sa.String(length=255), nullable=False, server_default=""),
+    )
+    # api_key_hash held the same sha256 as api_key_sha, hex encoded.
+    op.execute("UPDATE api_clients SET api_key_hash = encode(api_key_sha, 'hex')")
@@ -0,0 +1,37 @@
+"""store item payloads as jsonb
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "store_items",
+        "data",
+        type_=postgresql.JSONB(),
+        existing_type=sa.JSON(),
+        existing_nullable=False,
+        postgresql_using="data::jsonb",
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "store_items",
+        "data",
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(),
+        existing_nullable=False,
+        postgresql_using="data::json",
+    )
@@ -0,0 +1,94 @@
+"""fingerprint store items with blake2b-128
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-14
+"""
+
+import hashlib
+
+from alembic import op
+import orjson
+import sqlalchemy as sa
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+# Frozen copy of the fingerprint input as of this revision, so later changes
+# to app.utils cannot change what this migration writes.
+def _fingerprint_input(payload, price_field, quantity_field) -> bytes:
+    if isinstance(payload, dict):
+        excluded = {field for field in (price_field, quantity_field) if field} or {"price", "quantity"}
+        payload = {key: value for key, value in payload.items() if key not in excluded}
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+
+
+def _blake2b_128(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _sha256(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _refingerprint(digest) -> None:
+    # Fingerprints depend on each client's detected fields, so they are
+    # recomputed here rather than converted in SQL.
+    bind = op.get_bind()
+    mappings = {
+        row.api_client_id: (row.price_field, row.quantity_field)
+        for row in bind.execute(
+            sa.text("SELECT api_client_id, price_field, quantity_field FROM field_mappings")
+        )
+    }
+    last_id = None
+    while True:
+        query = "SELECT id, api_client_id, data FROM store_items"
+        if last_id is not None:
+            query += " WHERE id > :last_id"
+        rows = bind.execute(
+            sa.text(query + " ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE store_items SET fingerprint = :fingerprint WHERE id = :id"),
+            [
+                {
+                    "id": row.id,
+                    "fingerprint": digest(
+                        _fingerprint_input(row.data, *mappings.get(row.api_client_id, (None, None)))
+                    ),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    _refingerprint(_blake2b_128)
+    op.alter_column(
+        "store_items",
+        "fingerprint",
+        type_=sa.String(length=32),
+        existing_type=sa.String(length=64),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "store_items",
+        "fingerprint",
+        type_=sa.String(length=64),
+        existing_type=sa.String(length=32),
+        existing_nullable=False,
+    )
+    _refingerprint(_sha256)
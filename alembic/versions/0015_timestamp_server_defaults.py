@@ -0,0 +1,50 @@
+"""default timestamp columns to now() on the server
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015"
+down_revision = "0014"
+branch_labels = None
+depends_on = None
+
+# The previous default, as created in 0001; field_mappings.detected_at had none.
+# TIMEZONE('utc', now()) is a naive timestamp that Postgres reinterprets in the
+# session time zone when storing it, so it was only right on UTC sessions.
+LEGACY_DEFAULT = sa.text("TIMEZONE('utc', now())")
+
+TIMESTAMP_COLUMNS = [
+    ("api_clients", "created_at", LEGACY_DEFAULT),
+    ("store_items", "created_at", LEGACY_DEFAULT),
+    ("store_items", "updated_at", LEGACY_DEFAULT),
+    ("access_tokens", "created_at", LEGACY_DEFAULT),
+    ("password_reset_tokens", "created_at", LEGACY_DEFAULT),
+    ("field_mappings", "detected_at", None),
+]
+
+
+def upgrade() -> None:
+    for table_name, column_name, _ in TIMESTAMP_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            server_default=sa.func.now(),
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=False,
+        )
+
+
+def downgrade() -> None:
+    for table_name, column_name, previous_default in TIMESTAMP_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            server_default=previous_default,
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=False,
+        )
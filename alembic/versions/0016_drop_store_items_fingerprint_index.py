@@ -0,0 +1,35 @@
+"""drop the standalone store_items fingerprint index
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-14
+"""
+
+from alembic import op
+
+revision = "0016"
+down_revision = "0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Every fingerprint lookup is scoped to a client, which the
+    # uq_store_item_fingerprint (api_client_id, fingerprint) index already
+    # serves; this one only added a write per ingested row.
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_store_items_fingerprint",
+            table_name="store_items",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_store_items_fingerprint",
+            "store_items",
+            ["fingerprint"],
+            postgresql_concurrently=True,
+        )
@@ -1,8 +1,15 @@
+import asyncio
 import hashlib
 import hmac
+import os
 import secrets
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
-from fastapi import Depends, Header, HTTPException, status
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHashError, VerificationError
+from fastapi import Depends, Header, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,49 +17,99 @@ from app.db import get_db_session
 from app.models import AccessToken, ApiClient
 from app.settings import Settings
 
+# Hashes written before the Argon2id switch, encoded by migration 0007 as
+# pbkdf2_sha256$<iterations>$<salt>$<hex digest>. Rehashed on next login.
+LEGACY_PASSWORD_PREFIX = "pbkdf2_sha256$"
+
+
+def build_password_hasher(settings: Settings) -> PasswordHasher:
+    # Built per app from its settings so the cost can be tuned per deployment.
+    # Changing it makes existing hashes report password_needs_rehash, so they
+    # are upgraded on the next successful login.
+    return PasswordHasher(
+        time_cost=settings.argon2_time_cost,
+        memory_cost=settings.argon2_memory_cost_kib,
+        parallelism=settings.argon2_parallelism,
+        # Pinned rather than inherited from argon2-cffi's defaults, which a
+        # library upgrade could change and so force a rehash of every password.
+        hash_len=32,
+        salt_len=16,
+        type=Type.ID,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class AuthenticatedClient:
+    """Identity resolved from request credentials, safe to cache across requests."""
+
+    id: uuid.UUID
+
 
 def generate_api_key(settings: Settings) -> str:
     token = secrets.token_urlsafe(settings.api_key_length)
     return f"{settings.api_key_prefix}{token}"
 
 
-def hash_api_key(api_key: str) -> str:
-    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
-
+def api_key_sha(api_key: str) -> bytes:
+    return hashlib.sha256(api_key.encode("utf-8")).digest()
 
-def api_key_sha(api_key: str) -> str:
-    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
 
+def hash_password(hasher: PasswordHasher, password: str) -> str:
+    return hasher.hash(password)
 
-def verify_api_key(api_key: str, hashed: str) -> bool:
-    computed = hash_api_key(api_key)
-    return hmac.compare_digest(computed, hashed)
 
-
-def hash_password(password: str, salt: str) -> str:
-    return hashlib.pbkdf2_hmac(
+def _verify_legacy_password(password: str, password_hash: str) -> bool:
+    _, iterations, salt, expected = password_hash.split("$", 3)
+    computed = hashlib.pbkdf2_hmac(
         "sha256",
         password.encode("utf-8"),
         salt.encode("utf-8"),
-        200_000,
+        int(iterations),
     ).hex()
+    return hmac.compare_digest(computed, expected)
+
 
+def verify_password(hasher: PasswordHasher, password: str, password_hash: str) -> bool:
+    if password_hash.startswith(LEGACY_PASSWORD_PREFIX):
+        return _verify_legacy_password(password, password_hash)
+    try:
+        return hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
 
-def generate_password_salt() -> str:
-    return secrets.token_urlsafe(16)
 
+def password_needs_rehash(hasher: PasswordHasher, password_hash: str) -> bool:
+    if password_hash.startswith(LEGACY_PASSWORD_PREFIX):
+        return True
+    return hasher.check_needs_rehash(password_hash)
 
-def verify_password(password: str, salt: str, password_hash: str) -> bool:
-    computed = hash_password(password, salt)
-    return hmac.compare_digest(computed, password_hash)
+
+# Argon2 is deliberately slow and releases the GIL, so the async endpoints run
+# it on worker threads instead of stalling the event loop for every request.
+# A pool of its own, one thread per core: each hash holds argon2_memory_cost_kib
+# of RAM, and a login storm must not take every thread of the default executor
+# that asyncio.to_thread shares with ingest fingerprinting.
+_password_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="argon2")
+
+
+async def hash_password_async(hasher: PasswordHasher, password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, hash_password, hasher, password)
+
+
+async def verify_password_async(hasher: PasswordHasher, password: str, password_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, verify_password, hasher, password, password_hash
+    )
 
 
 def generate_access_token() -> str:
     return secrets.token_urlsafe(40)
 
 
-def token_sha(token: str) -> str:
-    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+def token_sha(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
 
 
 def generate_reset_token() -> str:
@@ -63,31 +120,43 @@ def generate_reset_token() -> str:
 
 
 async def get_api_client(
+    request: Request,
     api_key: str = Header(alias="X-API-Key"),
     session: AsyncSession = Depends(get_db_session),
-) -> ApiClient:
+) -> AuthenticatedClient:
     sha = api_key_sha(api_key)
-    result = await session.execute(select(ApiClient).where(ApiClient.api_key_sha == sha))
-    client = result.scalar_one_or_none()
-    if not client or not verify_api_key(api_key, client.api_key_hash):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+    cache = request.app.state.api_key_cache
+    client = cache.get(sha)
+    if client is None:
+        # A match on the unique api_key_sha column is the authentication check.
+        result = await session.execute(select(ApiClient.id).where(ApiClient.api_key_sha == sha))
+        client_id = result.scalar_one_or_none()
+        if client_id is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+        client = AuthenticatedClient(id=client_id)
+        cache.set(sha, client)
     return client
 
 
 async def get_token_client(
+    request: Request,
     authorization: str = Header(alias="Authorization"),
     session: AsyncSession = Depends(get_db_session),
-) -> ApiClient:
+) -> AuthenticatedClient:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     token = authorization.split(" ", 1)[1].strip()
     token_hash = token_sha(token)
-    result = await session.execute(
-        select(ApiClient)
-        .join(AccessToken)
-        .where(AccessToken.token_sha == token_hash)
-    )
-    client = result.scalar_one_or_none()
-    if not client:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    cache = request.app.state.token_cache
+    client = cache.get(token_hash)
+    if client is None:
+        # Index-only scan on ix_access_tokens_token_sha_covering; callers only need the id.
+        result = await session.execute(
+            select(AccessToken.api_client_id).where(AccessToken.token_sha == token_hash)
+        )
+        api_client_id = result.scalar_one_or_none()
+        if api_client_id is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        client = AuthenticatedClient(id=api_client_id)
+        cache.set(token_hash, client)
     return client
@@ -1,12 +1,46 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import select, update
+import orjson
+from sqlalchemy import Row, Uuid, bindparam, column, false, func, insert, literal, or_, select, table, text, update
 from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import AccessToken, ApiClient, FieldMapping, PasswordResetToken, StoreItem
-from app.utils import compute_fingerprint, extract_number
+from app.utils import extract_number, make_fingerprinter
+
+
+# Built once at import: the auth endpoints look clients up by email on every
+# call, and a module-level statement with a bindparam reuses one cache key.
+# Plain column rows rather than ApiClient entities: callers only read these,
+# so there is no identity-map or attribute instrumentation work per lookup.
+_CLIENT_BY_EMAIL = select(ApiClient.id, ApiClient.email, ApiClient.org_name).where(
+    ApiClient.email == bindparam("email")
+)
+
+
+async def get_client_by_email(session: AsyncSession, email: str) -> Row | None:
+    result = await session.execute(_CLIENT_BY_EMAIL, {"email": email})
+    return result.one_or_none()
+
+
+# The credential-checking endpoints need these columns instead.
+_CREDENTIALS_BY_EMAIL = select(
+    ApiClient.id,
+    ApiClient.password_hash,
+    ApiClient.api_key_sha,
+    ApiClient.distributor_id,
+    ApiClient.last_api_key_reset_at,
+).where(ApiClient.email == bindparam("email"))
+
+
+async def get_client_credentials(session: AsyncSession, email: str) -> Row | None:
+    result = await session.execute(_CREDENTIALS_BY_EMAIL, {"email": email})
+    return result.one_or_none()
 
 
 async def create_api_client(
@@ -14,16 +48,13 @@ async def create_api_client(
     email: str,
     org_name: str,
     distributor_id: str,
-    api_key_hash: str,
-    api_key_sha: str,
+    api_key_sha: bytes,
     password_hash: str,
-    password_salt: str,
 ) -> ApiClient:
-    existing = await session.execute(select(ApiClient).where(ApiClient.email == email))
-    if existing.scalar_one_or_none():
+    if await get_client_by_email(session, email):
         raise ValueError("Email already registered")
     existing_distributor = await session.execute(
-        select(ApiClient).where(ApiClient.distributor_id == distributor_id)
+        select(ApiClient.id).where(ApiClient.distributor_id == distributor_id)
     )
     if existing_distributor.scalar_one_or_none():
         raise ValueError("Distributor ID already registered")
@@ -31,70 +62,177 @@ async def create_api_client(
         email=email,
         org_name=org_name,
         distributor_id=distributor_id,
-        api_key_hash=api_key_hash,
         api_key_sha=api_key_sha,
         password_hash=password_hash,
-        password_salt=password_salt,
     )
     session.add(client)
     await session.commit()
-    await session.refresh(client)
     return client
 
 
 async def create_access_token(
     session: AsyncSession,
     api_client_id,
-    token_hash: str,
+    token_hash: bytes,
 ) -> AccessToken:
     token = AccessToken(api_client_id=api_client_id, token_sha=token_hash)
     session.add(token)
     await session.commit()
-    await session.refresh(token)
     return token
 
 
 async def update_api_key(
     session: AsyncSession,
-    client: ApiClient,
-    api_key_hash: str,
-    api_key_sha: str,
-) -> None:
-    client.api_key_hash = api_key_hash
-    client.api_key_sha = api_key_sha
-    client.last_api_key_reset_at = datetime.now(UTC)
+    api_client_id,
+    api_key_sha: bytes,
+    cooldown_cutoff: datetime,
+) -> bool:
+    """Rotate the API key unless another reset landed after ``cooldown_cutoff``.
+
+    The cooldown is re-checked in the UPDATE itself so two concurrent resets
+    cannot both pass it; returns False when this caller lost that race.
+    """
+    result = await session.execute(
+        update(ApiClient)
+        .where(
+            ApiClient.id == api_client_id,
+            or_(
+                ApiClient.last_api_key_reset_at.is_(None),
+                ApiClient.last_api_key_reset_at <= cooldown_cutoff,
+            ),
+        )
+        .values(api_key_sha=api_key_sha, last_api_key_reset_at=datetime.now(UTC))
+        .returning(ApiClient.id)
+    )
+    rotated = result.scalar_one_or_none() is not None
     await session.commit()
+    return rotated
 
 
-async def create_password_reset_token(
+async def update_password_hash(
     session: AsyncSession,
     api_client_id,
-    token_hash: str,
-) -> PasswordResetToken:
-    token = PasswordResetToken(api_client_id=api_client_id, token_sha=token_hash)
-    session.add(token)
+    password_hash: str,
+) -> None:
+    await session.execute(
+        update(ApiClient).where(ApiClient.id == api_client_id).values(password_hash=password_hash)
+    )
     await session.commit()
-    await session.refresh(token)
-    return token
 
 
-async def mark_reset_token_used(
+async def create_reset_token_for_email(
     session: AsyncSession,
-    token: PasswordResetToken,
-    password_hash: str,
-    password_salt: str,
-) -> None:
-    await session.execute(
-        update(ApiClient)
-        .where(ApiClient.id == token.api_client_id)
-        .values(password_hash=password_hash, password_salt=password_salt)
+    email: str,
+    token_hash: bytes,
+) -> Row | None:
+    """Store a reset token for the client with ``email``; None if there is none.
+
+    Returns the client's (id, email, org_name) for the reset email. On Postgres
+    the lookup and the insert are one INSERT ... SELECT round trip.
+    """
+    token_values = select(
+        literal(uuid.uuid4(), Uuid),
+        ApiClient.id,
+        literal(token_hash, PasswordResetToken.token_sha.type),
+    ).where(ApiClient.email == email)
+    insert_token = insert(PasswordResetToken).from_select(
+        ["id", "api_client_id", "token_sha"], token_values
     )
-    await session.execute(
+    if session.bind.dialect.name == "postgresql":
+        inserted = insert_token.returning(PasswordResetToken.api_client_id).cte("inserted_token")
+        result = await session.execute(
+            select(ApiClient.id, ApiClient.email, ApiClient.org_name).join(
+                inserted, inserted.c.api_client_id == ApiClient.id
+            )
+        )
+        client = result.one_or_none()
+    else:
+        client = await get_client_by_email(session, email)
+        if client is not None:
+            await session.execute(insert_token)
+    await session.commit()
+    return client
+
+
+async def claim_reset_token(
+    session: AsyncSession,
+    token_hash: bytes,
+    issued_after: datetime,
+) -> uuid.UUID | None:
+    """Mark an unused reset token issued after ``issued_after`` used; return its client id.
+
+    A conditional UPDATE, so a token can only be claimed once even under
+    concurrent confirms. Nothing is committed: the caller writes the new
+    password in the same transaction, and a rollback leaves the token unspent.
+    """
+    result = await session.execute(
         update(PasswordResetToken)
-        .where(PasswordResetToken.id == token.id)
+        .where(
+            PasswordResetToken.token_sha == token_hash,
+            PasswordResetToken.used_at.is_(None),
+            PasswordResetToken.created_at > issued_after,
+        )
         .values(used_at=datetime.now(UTC))
+        .returning(PasswordResetToken.api_client_id)
     )
-    await session.commit()
+    return result.scalar_one_or_none()
+
+
+# Payloads are upserted and committed in pages of this size so memory and
+# transaction length stay bounded regardless of the request size.
+BULK_UPSERT_PAGE_SIZE = 500
+# Postgres pages at least this large are streamed through COPY into a temp
+# staging table; smaller ones stay on a single INSERT ... VALUES statement so
+# we don't pay temp-table catalog churn for tiny requests.
+COPY_MIN_ROWS = 256
+STAGING_TABLE = "store_items_staging"
+COPY_COLUMNS = (
+    "id",
+    "api_client_id",
+    "fingerprint",
+    "data",
+    "price",
+    "quantity",
+    "is_exported",
+    "exported_at",
+)
+
+
+async def _copy_upsert_items(session: AsyncSession, rows: list[dict[str, Any]]):
+    """Load rows with COPY into a staging table, returning the merge source."""
+    await session.execute(
+        text(
+            f"CREATE TEMP TABLE {STAGING_TABLE} "
+            "(LIKE store_items INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+    )
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        STAGING_TABLE,
+        records=(
+            (
+                uuid.uuid4(),
+                row["api_client_id"],
+                row["fingerprint"],
+                orjson.dumps(row["data"]).decode(),
+                row["price"],
+                row["quantity"],
+                row["is_exported"],
+                row["exported_at"],
+            )
+            for row in rows
+        ),
+        columns=COPY_COLUMNS,
+    )
+    staging = table(STAGING_TABLE, *(column(name) for name in COPY_COLUMNS))
+    return pg_insert(StoreItem).from_select(COPY_COLUMNS, select(staging))
+
+
+async def _set_local_statement_timeout(session: AsyncSession, statement_timeout_ms: int | None) -> None:
+    # Lasts until the current transaction ends; None keeps the connection default.
+    if statement_timeout_ms is not None and session.bind.dialect.name == "postgresql":
+        await session.execute(text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}"))
 
 
 async def bulk_upsert_items(
@@ -103,39 +241,86 @@ async def bulk_upsert_items(
     payloads: list[dict[str, Any]],
     quantity_field: str | None = None,
     price_field: str | None = None,
+    statement_timeout_ms: int | None = None,
 ) -> int:
-    rows = []
-    now = datetime.now(UTC)
+    processed = 0
+    for start in range(0, len(payloads), BULK_UPSERT_PAGE_SIZE):
+        page = payloads[start : start + BULK_UPSERT_PAGE_SIZE]
+        try:
+            processed += await _upsert_page(
+                session, api_client_id, page, quantity_field, price_field, statement_timeout_ms
+            )
+        except Exception:
+            await session.rollback()
+            raise
+    return processed
+
+
+def _build_rows(
+    api_client_id,
+    payloads: list[dict[str, Any]],
+    quantity_field: str | None,
+    price_field: str | None,
+) -> tuple[dict[str, dict[str, Any]], int]:
+    # Keyed by fingerprint so repeated objects within a batch collapse onto the
+    # last occurrence; ON CONFLICT cannot touch the same row twice in one statement.
+    rows: dict[str, dict[str, Any]] = {}
+    processed = 0
+    fingerprint_of = make_fingerprinter(price_field, quantity_field)
     for payload in payloads:
         # Skip invalid payloads (empty or missing required fields)
         if not payload or not isinstance(payload, dict):
             continue
         
-        fingerprint = compute_fingerprint(payload, price_field, quantity_field)
-        rows.append(
-            {
-                "api_client_id": api_client_id,
-                "fingerprint": fingerprint,
-                "data": payload,
-                "price": extract_number(payload, price_field or "price"),
-                "quantity": extract_number(payload, quantity_field or "quantity"),
-                "updated_at": now,
-                "created_at": now,
-                "is_exported": False,
-                "exported_at": None,
-            }
-        )
+        fingerprint = fingerprint_of(payload)
+        rows[fingerprint] = {
+            "api_client_id": api_client_id,
+            "fingerprint": fingerprint,
+            "data": payload,
+            "price": extract_number(payload, price_field or "price"),
+            "quantity": extract_number(payload, quantity_field or "quantity"),
+            "is_exported": False,
+            "exported_at": None,
+        }
+        processed += 1
+    return rows, processed
+
+
+async def _upsert_page(
+    session: AsyncSession,
+    api_client_id,
+    payloads: list[dict[str, Any]],
+    quantity_field: str | None,
+    price_field: str | None,
+    statement_timeout_ms: int | None = None,
+) -> int:
+    # Fingerprinting canonicalizes and hashes every payload; run it off the
+    # event loop so other requests keep being served during large ingests.
+    rows, processed = await asyncio.to_thread(
+        _build_rows, api_client_id, payloads, quantity_field, price_field
+    )
 
     if not rows:
         return 0
 
     if session.bind.dialect.name == "postgresql":
-        stmt = pg_insert(StoreItem).values(rows)
+        await _set_local_statement_timeout(session, statement_timeout_ms)
+        if len(rows) >= COPY_MIN_ROWS:
+            stmt = await _copy_upsert_items(session, list(rows.values()))
+            params = None
+        else:
+            # One cached statement instead of a VALUES list recompiled for every
+            # distinct page length. The RETURNING below is what routes it through
+            # insertmanyvalues: without it asyncpg runs a plain executemany.
+            # Pages here stay under COPY_MIN_ROWS, well inside the default
+            # insertmanyvalues_page_size, so each one is a single INSERT.
+            stmt = pg_insert(StoreItem)
+            params = list(rows.values())
         update_columns = {
             "data": stmt.excluded.data,
             "price": stmt.excluded.price,
             "quantity": stmt.excluded.quantity,
-            "updated_at": now,
+            "updated_at": func.now(),
             "is_exported": False,
             "exported_at": None,
         }
@@ -143,61 +328,133 @@ async def bulk_upsert_items(
             index_elements=["api_client_id", "fingerprint"],
             set_=update_columns,
         )
-        await session.execute(stmt)
+        if params is not None:
+            stmt = stmt.returning(StoreItem.id)
+        await session.execute(stmt, params)
         await session.commit()
-        return len(rows)
+        return processed
 
-    processed = 0
-    for row in rows:
-        result = await session.execute(
-            select(StoreItem).where(
-                StoreItem.api_client_id == api_client_id,
-                StoreItem.fingerprint == row["fingerprint"],
-            )
+    result = await session.execute(
+        select(StoreItem.fingerprint, StoreItem.id).where(
+            StoreItem.api_client_id == api_client_id,
+            StoreItem.fingerprint.in_(list(rows)),
         )
-        item = result.scalar_one_or_none()
-        if item:
-            for key, value in row.items():
-                if key == "created_at":
-                    continue
-                setattr(item, key, value)
-        else:
-            session.add(StoreItem(**row))
-        processed += 1
+    )
+    existing = dict(result.all())
+    to_insert = [row for fingerprint, row in rows.items() if fingerprint not in existing]
+    now = datetime.now(UTC)
+    to_update = [
+        {"id": existing[fingerprint], **row, "updated_at": now}
+        for fingerprint, row in rows.items()
+        if fingerprint in existing
+    ]
+    if to_insert:
+        await session.execute(insert(StoreItem), to_insert)
+    if to_update:
+        await session.execute(update(StoreItem), to_update)
     await session.commit()
     return processed
 
 
-async def fetch_automation_batch(
+_AUTOMATION_COLUMNS = (
+    StoreItem.id,
+    StoreItem.data,
+    StoreItem.price,
+    StoreItem.quantity,
+    StoreItem.created_at,
+    StoreItem.updated_at,
+)
+
+
+async def stream_automation_batch(
     session: AsyncSession,
     api_client_id,
     limit: int,
-):
+    statement_timeout_ms: int | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Claim up to ``limit`` unexported items, yielding plain row dicts.
+
+    Rows come off a server-side cursor instead of being loaded as ORM objects.
+    The claim is only committed once every row has been yielded, so a client
+    that disconnects mid-stream leaves the batch pending for the next poll.
+    """
     query = (
-        select(StoreItem)
+        select(StoreItem.id)
         .where(
-            StoreItem.is_exported.is_(False),
+            StoreItem.is_exported == false(),
             StoreItem.api_client_id == api_client_id,
         )
         .order_by(StoreItem.created_at)
         .limit(limit)
     )
     if session.bind.dialect.name == "postgresql":
-        query = query.with_for_update(skip_locked=True)
+        claimed = (
+            update(StoreItem)
+            .where(StoreItem.id.in_(query.with_for_update(skip_locked=True).scalar_subquery()))
+            .values(is_exported=True, exported_at=datetime.now(UTC))
+            .returning(*_AUTOMATION_COLUMNS)
+            .cte("claimed")
+        )
+        # The cursor stays open while a slow client reads the stream.
+        await _set_local_statement_timeout(session, statement_timeout_ms)
+        result = await session.stream(select(claimed).order_by(claimed.c.created_at))
+        async for row in result.mappings():
+            yield dict(row)
+        await session.commit()
+        return
+
+    ids = []
+    result = await session.stream(query.with_only_columns(*_AUTOMATION_COLUMNS))
+    async for row in result.mappings():
+        ids.append(row["id"])
+        yield dict(row)
+    if ids:
+        await session.execute(
+            update(StoreItem)
+            .where(StoreItem.id.in_(ids))
+            .values(is_exported=True, exported_at=datetime.now(UTC))
+        )
+        await session.commit()
+
 
-    result = await session.execute(query)
-    items = list(result.scalars().all())
-    if not items:
-        return []
+async def fetch_automation_batch(
+    session: AsyncSession,
+    api_client_id,
+    limit: int,
+    statement_timeout_ms: int | None = None,
+) -> list[dict[str, Any]]:
+    return [
+        row async for row in stream_automation_batch(session, api_client_id, limit, statement_timeout_ms)
+    ]
 
-    ids = [item.id for item in items]
+
+async def warm_statement_cache(session: AsyncSession) -> None:
+    """Run each hot lookup once so its compiled form is cached before traffic.
+
+    SQLAlchemy keys its compiled cache on statement structure, not on bound
+    values, so placeholder ids that match nothing warm the same entries the
+    endpoints hit. The reset-token and automation-claim writes are warmed too.
+    Startup leaves data alone because their placeholders match no rows, not
+    because of the final rollback: two of them commit their own work. The item
+    upserts are left to the first request.
+    """
+    placeholder_id = uuid.uuid4()
+    placeholder_sha = bytes(32)
+    await get_client_by_email(session, "")
+    await get_client_credentials(session, "")
+    await get_field_mapping(session, placeholder_id)
+    await session.execute(select(ApiClient.id).where(ApiClient.api_key_sha == placeholder_sha))
     await session.execute(
-        update(StoreItem)
-        .where(StoreItem.id.in_(ids))
-    .values(is_exported=True, exported_at=datetime.now(UTC))
+        select(AccessToken.api_client_id).where(AccessToken.token_sha == placeholder_sha)
     )
-    await session.commit()
-    return items
+    # Writes that match nothing for an unknown client or token. These two
+    # commit, so the rollback cannot undo them.
+    await create_reset_token_for_email(session, "", placeholder_sha)
+    await fetch_automation_batch(session, placeholder_id, 1)
+    # claim_reset_token leaves its transaction open for the caller; run it last
+    # so the rollback does discard it.
+    await claim_reset_token(session, placeholder_sha, datetime.now(UTC))
+    await session.rollback()
 
 
 async def get_field_mapping(session: AsyncSession, api_client_id) -> FieldMapping | None:
@@ -214,29 +471,20 @@ async def create_field_mapping(
     quantity_field: str | None,
     price_field: str | None,
 ) -> FieldMapping:
-    """Store detected field mapping for an organization."""
-    # Delete old mapping if exists
-    await session.execute(
-        update(FieldMapping).where(FieldMapping.api_client_id == api_client_id).values(
-            quantity_field=quantity_field, price_field=price_field, detected_at=datetime.now(UTC)
-        )
-    )
-    
-    # Check if update affected anything
-    result = await session.execute(
-        select(FieldMapping).where(FieldMapping.api_client_id == api_client_id)
+    """Store detected field mapping for an organization.
+
+    The first mapping stored wins: if another worker got there first, its row is
+    returned unchanged, so every worker fingerprints under the same fields.
+    """
+    insert_fn = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert_fn(FieldMapping).values(
+        api_client_id=api_client_id,
+        quantity_field=quantity_field,
+        price_field=price_field,
     )
-    mapping = result.scalar_one_or_none()
-    
-    if not mapping:
-        # Create new if doesn't exist
-        mapping = FieldMapping(
-            api_client_id=api_client_id,
-            quantity_field=quantity_field,
-            price_field=price_field,
-        )
-        session.add(mapping)
-    
+    stmt = stmt.on_conflict_do_nothing(index_elements=["api_client_id"]).returning(FieldMapping)
+    mapping = (await session.execute(stmt)).scalar_one_or_none()
+    if mapping is None:
+        mapping = await get_field_mapping(session, api_client_id)
     await session.commit()
-    await session.refresh(mapping)
     return mapping
@@ -1,15 +1,70 @@
-from typing import AsyncIterator
+import uuid
+from typing import Any, AsyncIterator
 
+import orjson
 from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 
-def create_engine(database_url: str) -> AsyncEngine:
+def _json_serializer(value: Any) -> str:
+    return orjson.dumps(value).decode()
+
+
+def create_engine(
+    database_url: str,
+    *,
+    pool_size: int = 20,
+    max_overflow: int = 40,
+    pool_timeout: float = 30,
+    pool_recycle: int = 1800,
+    pgbouncer: bool = False,
+    statement_timeout_ms: int = 5000,
+    jit: bool = False,
+) -> AsyncEngine:
     # SQLite doesn't support pool_size and max_overflow
-    engine_kwargs = {"pool_pre_ping": True}
-    if "sqlite" not in database_url.lower():
-        engine_kwargs.update({"pool_size": 5, "max_overflow": 10})
-    
+    engine_kwargs = {
+        "pool_pre_ping": True,
+        # JSON/JSONB bind and result values go through orjson instead of stdlib json.
+        "json_serializer": _json_serializer,
+        "json_deserializer": orjson.loads,
+    }
+    if "sqlite" in database_url.lower():
+        return create_async_engine(database_url, **engine_kwargs)
+    if pgbouncer:
+        # PgBouncer in transaction mode pools the server connections, so keep
+        # none here, and prepared statements cannot outlive a transaction.
+        # Startup parameters are not forwarded either; set statement_timeout
+        # and jit on the database role instead.
+        engine_kwargs.update(
+            {
+                "poolclass": NullPool,
+                "connect_args": {
+                    "statement_cache_size": 0,
+                    "prepared_statement_cache_size": 0,
+                    "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+                },
+            }
+        )
+    else:
+        engine_kwargs.update(
+            {
+                "pool_size": pool_size,
+                "max_overflow": max_overflow,
+                "pool_timeout": pool_timeout,
+                "pool_recycle": pool_recycle,
+                # Stuck queries give their connection back after the timeout;
+                # JIT only adds planning latency to these short OLTP statements.
+                # Bulk merges and export streams raise the timeout per transaction.
+                "connect_args": {
+                    "server_settings": {
+                        "statement_timeout": str(statement_timeout_ms),
+                        "jit": "on" if jit else "off",
+                    }
+                },
+            }
+        )
+
     return create_async_engine(database_url, **engine_kwargs)
 
 
@@ -18,6 +73,11 @@ def create_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]
 
 
 async def get_db_session(request: Request) -> AsyncIterator[AsyncSession]:
+    session = getattr(request.state, "db_session", None)
+    if session is not None:
+        # Opened and closed by the guard middleware for this request.
+        yield session
+        return
     sessionmaker = request.app.state.sessionmaker
     async with sessionmaker() as session:
         yield session
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
 import httpx
+from fastapi import Request
 from pybars import Compiler
 
 from app.settings import Settings
@@ -19,29 +22,49 @@ class RenderedEmail:
 TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "email-templates"
 
 
+def _compile_dir(compiler: Compiler, directory: Path) -> dict[str, Any]:
+    if not directory.is_dir():
+        return {}
+    with os.scandir(directory) as entries:
+        sources = {
+            entry.name.removesuffix(".hbs"): Path(entry.path).read_text(encoding="utf-8")
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(".hbs")
+        }
+    return {name: compiler.compile(source) for name, source in sources.items()}
+
+
+@lru_cache(maxsize=1)
+def _compile_templates() -> tuple[dict[str, Any], dict[str, Any], Any]:
+    # Templates are static, so every EmailService in the process shares one
+    # compiled set instead of re-reading and re-parsing the directory.
+    compiler = Compiler()
+    partials = _compile_dir(compiler, TEMPLATE_DIR / "partials")
+    templates = _compile_dir(compiler, TEMPLATE_DIR)
+    layout = compiler.compile((TEMPLATE_DIR / "layouts" / "base.hbs").read_text(encoding="utf-8"))
+    return partials, templates, layout
+
+
 class EmailService:
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
-        self._compiler = Compiler()
-        self._partials = self._load_partials()
-
-    def _load_partials(self) -> dict[str, Any]:
-        partials_dir = TEMPLATE_DIR / "partials"
-        partials: dict[str, Any] = {}
-        if not partials_dir.exists():
-            return partials
-        for path in partials_dir.glob("*.hbs"):
-            partials[path.stem] = self._compiler.compile(path.read_text(encoding="utf-8"))
-        return partials
+        self._http: httpx.AsyncClient | None = None
+        self._partials, self._templates, self._layout = _compile_templates()
 
-    def _render(self, template_name: str, context: dict[str, Any]) -> str:
-        template_path = TEMPLATE_DIR / f"{template_name}.hbs"
-        layout_path = TEMPLATE_DIR / "layouts" / "base.hbs"
-        body_template = self._compiler.compile(template_path.read_text(encoding="utf-8"))
-        body = body_template(context, partials=self._partials)
+    def _client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop.
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=10, base_url="https://api.resend.com")
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
-        layout_template = self._compiler.compile(layout_path.read_text(encoding="utf-8"))
-        return layout_template({"body": body}, partials=self._partials)
+    def _render(self, template_name: str, context: dict[str, Any]) -> str:
+        body = self._templates[template_name](context, partials=self._partials)
+        return self._layout({"body": body}, partials=self._partials)
 
     def render_forgot_password(self, user_name: str, token: str) -> RenderedEmail:
         html = self._render("forgot-password", {"userName": user_name, "token": token})
@@ -66,10 +89,14 @@ class EmailService:
             "html": rendered.html,
         }
 
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.post(
-                "https://api.resend.com/emails",
-                headers={"Authorization": f"Bearer {self.settings.resend_api_key}"},
-                json=payload,
-            )
-            response.raise_for_status()
\ No newline at end of file
+        response = await self._client().post(
+            "/emails",
+            headers={"Authorization": f"Bearer {self.settings.resend_api_key}"},
+            json=payload,
+        )
+        response.raise_for_status()
+
+
+def get_email_service(request: Request) -> EmailService:
+    # One service per app, built in create_app and closed in its lifespan.
+    return request.app.state.email_service
@@ -1,42 +1,55 @@
+import asyncio
+import json
+import uuid
+from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
 from typing import Any
 import re
+import time
 
-from fastapi import Body, Depends, FastAPI, HTTPException, Query, status
-from fastapi.responses import ORJSONResponse
+import orjson
+from fastapi import BackgroundTasks, Body, Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import (
     api_key_sha,
+    build_password_hasher,
     generate_access_token,
     generate_api_key,
-    generate_password_salt,
     generate_reset_token,
     get_api_client,
     get_token_client,
-    hash_api_key,
-    hash_password,
+    hash_password_async,
+    password_needs_rehash,
     token_sha,
-    verify_password,
+    verify_password_async,
 )
 from app.crud import (
+    BULK_UPSERT_PAGE_SIZE,
     bulk_upsert_items,
+    claim_reset_token,
     create_access_token,
     create_api_client,
     create_field_mapping,
-    create_password_reset_token,
+    create_reset_token_for_email,
     fetch_automation_batch,
+    get_client_credentials,
     get_field_mapping,
-    mark_reset_token_used,
+    stream_automation_batch,
     update_api_key,
+    update_password_hash,
+    warm_statement_cache,
 )
+from app.cache import TTLCache
 from app.db import create_engine, create_sessionmaker, get_db_session
-from app.email_service import EmailService
+from app.email_service import EmailService, get_email_service
+from app.middleware import NDJSON_INGEST_PATH, GuardMiddleware
 from app.rate_limit import RateLimiter
-from app.models import ApiClient, Base, PasswordResetToken
+from app.models import Base
 from app.schemas import (
     ApiKeyResetRequest,
     ApiKeyResetResponse,
@@ -54,6 +67,77 @@ from app.schemas import (
 from app.settings import Settings, get_settings
 
 
+def orjson_default(value: Any) -> Any:
+    # Numeric columns arrive as Decimal and asyncpg returns its own UUID type;
+    # neither is native to orjson.
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+# Timestamps are UTC; render them with a Z suffix, treating any naive value as UTC.
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=ORJSON_OPTIONS)
+
+
+class RawORJSONResponse(ORJSONResponse):
+    """Encodes plain rows directly, for endpoints that skip the response model pass.
+
+    The route's response_model still documents the shape in OpenAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+async def read_capped_body(request: Request, limit: int) -> bytearray:
+    # GuardMiddleware rejects a declared Content-Length over the limit; this
+    # also stops chunked uploads that declare none, before they pile up in memory.
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail="Payload too large",
+            )
+    return body
+
+
+async def iter_ndjson(request: Request, max_line_bytes: int) -> AsyncIterator[Any]:
+    """Parse a newline-delimited JSON body one line at a time as it streams in."""
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line = buffer[start:end]
+            start = end + 1
+            if line.strip():
+                yield orjson.loads(line)
+        del buffer[:start]
+        # Only an unfinished line is buffered; refuse one that never ends.
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail="Line too large",
+            )
+    if buffer.strip():
+        yield orjson.loads(buffer)
+
+
+TAGS_METADATA = [
+    {"name": "Auth", "description": "Registration, token exchange, and password reset."},
+    {"name": "Ingest", "description": "Bulk data ingestion using API keys."},
+    {"name": "Automation", "description": "Batch retrieval for automation workflows."},
+]
+
+
 def create_app(
     settings: Settings | None = None,
     engine=None,
@@ -65,22 +149,24 @@ def create_app(
     async def lifespan(app: FastAPI):
         async with app.state.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+        async with app.state.sessionmaker() as session:
+            await warm_statement_cache(session)
+        # Build the OpenAPI schema now; FastAPI keeps it on app.openapi_schema,
+        # so the first /openapi.json or /docs hit doesn't walk every route.
+        app.openapi()
         yield
+        await app.state.email_service.aclose()
+        if app.state.redis is not None:
+            await app.state.redis.aclose()
         await app.state.engine.dispose()
 
-    tags_metadata = [
-        {"name": "Auth", "description": "Registration, token exchange, and password reset."},
-        {"name": "Ingest", "description": "Bulk data ingestion using API keys."},
-        {"name": "Automation", "description": "Batch retrieval for automation workflows."},
-    ]
-
     app = FastAPI(
         default_response_class=ORJSONResponse,
         title="Store Bulk API",
         description="Bulk ingest API with per-org automation access and password reset support.",
         version="1.0.0",
         contact={"name": "PharmacyOS", "email": "support@usepharmacyos.com"},
-        openapi_tags=tags_metadata,
+        openapi_tags=TAGS_METADATA,
         lifespan=lifespan,
     )
     app.add_middleware(
@@ -90,50 +176,78 @@ def create_app(
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    engine = engine or create_engine(settings.database_url)
+    engine = engine or create_engine(
+        settings.database_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pgbouncer=settings.db_pgbouncer,
+        statement_timeout_ms=settings.db_statement_timeout_ms,
+        jit=settings.db_jit,
+    )
     sessionmaker = sessionmaker or create_sessionmaker(engine)
     app.state.engine = engine
     app.state.sessionmaker = sessionmaker
     app.state.settings = settings
-    app.state.rate_limiter = RateLimiter(settings)
-
-    @app.middleware("http")
-    async def rate_limit_middleware(request, call_next):
-        if request.url.path.startswith("/docs") or request.url.path.startswith("/openapi"):
-            return await call_next(request)
-
-        sessionmaker = app.state.sessionmaker
-        async with sessionmaker() as session:
-            await app.state.rate_limiter.check(request, session)
-
-        return await call_next(request)
-
-    @app.middleware("http")
-    async def origin_guard_middleware(request, call_next):
-        if request.url.path.startswith("/docs") or request.url.path.startswith("/openapi"):
-            return await call_next(request)
-        if request.url.path == "/v1/bulk-ingest":
-            return await call_next(request)
-
-        origin = request.headers.get("origin")
-        if origin:
-            if not re.match(settings.allowed_origin_regex, origin):
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Origin not allowed")
-
-        return await call_next(request)
+    app.state.redis = None
+    if settings.redis_url:
+        from redis import asyncio as redis_asyncio
+
+        app.state.redis = redis_asyncio.from_url(settings.redis_url)
+    app.state.rate_limiter = RateLimiter(settings, redis=app.state.redis)
+    app.state.email_service = EmailService(settings)
+    app.state.gemini_client = None
+    if settings.gemini_api_key:
+        from google import genai
+
+        app.state.gemini_client = genai.Client(api_key=settings.gemini_api_key)
+    app.state.api_key_cache = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+    # Access tokens never expire or get revoked, so the TTL only bounds how long
+    # a row removed out of band keeps authenticating.
+    app.state.token_cache = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+    # The first stored mapping wins and is never rewritten, so entries need no TTL.
+    app.state.field_mapping_cache = TTLCache(settings.field_mapping_cache_max_entries)
+    # Argon2 cost comes from this app's settings, not the process-wide ones.
+    app.state.password_hasher = password_hasher = build_password_hasher(settings)
+    # Compiled once per app; the guards below run on every request.
+    app.state.origin_re = re.compile(settings.allowed_origin_regex)
+
+    # Added after CORS so it runs outermost, ahead of every other layer.
+    app.add_middleware(
+        GuardMiddleware,
+        sessionmaker=sessionmaker,
+        rate_limiter=app.state.rate_limiter,
+        origin_re=app.state.origin_re,
+        allowed_host_suffix=settings.allowed_host_suffix,
+        max_payload_bytes=settings.max_payload_bytes,
+    )
 
-    @app.middleware("http")
-    async def host_guard_middleware(request, call_next):
-        if request.url.path.startswith("/docs") or request.url.path.startswith("/openapi"):
-            return await call_next(request)
-        if request.url.path == "/v1/bulk-ingest":
-            return await call_next(request)
+    async def authenticate_outside_cooldown(session: AsyncSession, email: str, password: str):
+        """Check email/password and refuse while an API key reset cooldown is running.
 
-        host = request.headers.get("host")
-        if host and not re.match(r".*\.usepharmacyos\.com$", host):
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Host not allowed")
+        Shared by token issue and API key reset; returns the client's credential row.
+        """
+        client = await get_client_credentials(session, email)
+        if not client or not await verify_password_async(
+            password_hasher, password, client.password_hash
+        ):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        if password_needs_rehash(password_hasher, client.password_hash):
+            password_hash = await hash_password_async(password_hasher, password)
+            await update_password_hash(session, client.id, password_hash)
 
-        return await call_next(request)
+        if client.last_api_key_reset_at:
+            elapsed = time.time() - client.last_api_key_reset_at.timestamp()
+            cooldown = settings.api_key_reset_cooldown_minutes * 60
+            if elapsed < cooldown:
+                retry_after = int(cooldown - elapsed)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="API key reset cooldown active",
+                    headers={"Retry-After": str(retry_after)},
+                )
+        return client
 
     @app.post(
         "/v1/clients/register",
@@ -177,17 +291,14 @@ def create_app(
         session: AsyncSession = Depends(get_db_session),
     ) -> ClientRegistrationResponse:
         api_key = generate_api_key(settings)
-        password_salt = generate_password_salt()
         try:
             client = await create_api_client(
                 session,
                 email=payload.email,
                 org_name=payload.org_name,
                 distributor_id=payload.distributor_id,
-                api_key_hash=hash_api_key(api_key),
                 api_key_sha=api_key_sha(api_key),
-                password_hash=hash_password(payload.password, password_salt),
-                password_salt=password_salt,
+                password_hash=await hash_password_async(password_hasher, payload.password),
             )
         except ValueError as exc:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
@@ -231,26 +342,7 @@ def create_app(
         ),
         session: AsyncSession = Depends(get_db_session),
     ) -> TokenResponse:
-        result = await session.execute(
-            select(ApiClient).where(ApiClient.email == payload.email)
-        )
-        client = result.scalar_one_or_none()
-        if not client or not verify_password(payload.password, client.password_salt, client.password_hash):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-
-        if client.last_api_key_reset_at:
-            last_reset = client.last_api_key_reset_at
-            if last_reset.tzinfo is None:
-                last_reset = last_reset.replace(tzinfo=UTC)
-            elapsed = (datetime.now(UTC) - last_reset).total_seconds()
-            cooldown = settings.api_key_reset_cooldown_minutes * 60
-            if elapsed < cooldown:
-                retry_after = int(cooldown - elapsed)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="API key reset cooldown active",
-                    headers={"Retry-After": str(retry_after)},
-                )
+        client = await authenticate_outside_cooldown(session, payload.email, payload.password)
 
         access_token = generate_access_token()
         await create_access_token(session, client.id, token_sha(access_token))
@@ -288,29 +380,20 @@ def create_app(
         ),
         session: AsyncSession = Depends(get_db_session),
     ) -> ApiKeyResetResponse:
-        result = await session.execute(
-            select(ApiClient).where(ApiClient.email == payload.email)
-        )
-        client = result.scalar_one_or_none()
-        if not client or not verify_password(payload.password, client.password_salt, client.password_hash):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-
-        if client.last_api_key_reset_at:
-            last_reset = client.last_api_key_reset_at
-            if last_reset.tzinfo is None:
-                last_reset = last_reset.replace(tzinfo=UTC)
-            elapsed = (datetime.now(UTC) - last_reset).total_seconds()
-            cooldown = settings.api_key_reset_cooldown_minutes * 60
-            if elapsed < cooldown:
-                retry_after = int(cooldown - elapsed)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="API key reset cooldown active",
-                    headers={"Retry-After": str(retry_after)},
-                )
+        client = await authenticate_outside_cooldown(session, payload.email, payload.password)
 
+        previous_sha = client.api_key_sha
         new_api_key = generate_api_key(settings)
-        await update_api_key(session, client, hash_api_key(new_api_key), api_key_sha(new_api_key))
+        cooldown = settings.api_key_reset_cooldown_minutes * 60
+        cutoff = datetime.now(UTC) - timedelta(seconds=cooldown)
+        if not await update_api_key(session, client.id, api_key_sha(new_api_key), cutoff):
+            # A concurrent reset for this client won the conditional UPDATE.
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="API key reset cooldown active",
+                headers={"Retry-After": str(cooldown)},
+            )
+        app.state.api_key_cache.pop(previous_sha)
         return ApiKeyResetResponse(api_key=new_api_key, distributor_id=client.distributor_id)
 
     @app.post(
@@ -320,6 +403,7 @@ def create_app(
         summary="Request a password reset",
         description=(
             "Generates a reset token and sends it via email. "
+            "Unknown emails get the same response without an email being sent. "
             "If RESET_TOKEN_DEBUG=true, the token is also returned in the response."
         ),
         responses={
@@ -330,6 +414,7 @@ def create_app(
         },
     )
     async def request_password_reset(
+        background_tasks: BackgroundTasks,
         payload: PasswordResetRequest = Body(
             ...,
             examples={
@@ -340,18 +425,18 @@ def create_app(
             },
         ),
         session: AsyncSession = Depends(get_db_session),
+        email_service: EmailService = Depends(get_email_service),
     ) -> PasswordResetResponse:
-        result = await session.execute(
-            select(ApiClient).where(ApiClient.email == payload.email)
-        )
-        client = result.scalar_one_or_none()
-        if not client:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Email not found")
-
         reset_token = generate_reset_token()
-        await create_password_reset_token(session, client.id, token_sha(reset_token))
-        email_service = EmailService(settings)
-        await email_service.send_reset_email(
+        client = await create_reset_token_for_email(session, payload.email, token_sha(reset_token))
+        # Answer identically for unknown emails so the endpoint does not reveal
+        # which addresses are registered.
+        if client is None:
+            return PasswordResetResponse()
+
+        # Sent after the response goes out; the token is already persisted.
+        background_tasks.add_task(
+            email_service.send_reset_email,
             to_email=client.email,
             user_name=client.org_name or client.email,
             token=reset_token,
@@ -365,7 +450,10 @@ def create_app(
         response_model=PasswordResetConfirmResponse,
         tags=["Auth"],
         summary="Confirm a password reset",
-        description="Resets the password using the reset token received via email.",
+        description=(
+            "Resets the password using the reset token received via email. "
+            "Each token works once, within RESET_TOKEN_TTL_MINUTES of being issued."
+        ),
         responses={
             200: {
                 "description": "Password updated.",
@@ -385,21 +473,80 @@ def create_app(
         ),
         session: AsyncSession = Depends(get_db_session),
     ) -> PasswordResetConfirmResponse:
-        token_hash = token_sha(payload.reset_token)
-        result = await session.execute(
-            select(PasswordResetToken)
-            .where(PasswordResetToken.token_sha == token_hash)
-            .where(PasswordResetToken.used_at.is_(None))
-        )
-        token = result.scalar_one_or_none()
-        if not token:
+        # The token is claimed before hashing, so unknown, spent or expired
+        # tokens are refused without spending an Argon2 hash on them.
+        issued_after = datetime.now(UTC) - timedelta(minutes=settings.reset_token_ttl_minutes)
+        api_client_id = await claim_reset_token(session, token_sha(payload.reset_token), issued_after)
+        if api_client_id is None:
+            await session.rollback()
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
-        password_salt = generate_password_salt()
-        password_hash = hash_password(payload.new_password, password_salt)
-        await mark_reset_token_used(session, token, password_hash, password_salt)
+        password_hash = await hash_password_async(password_hasher, payload.new_password)
+        await update_password_hash(session, api_client_id, password_hash)
         return PasswordResetConfirmResponse()
 
+    detection_locks: dict[uuid.UUID, asyncio.Lock] = {}
+    field_mapping_cache = app.state.field_mapping_cache
+
+    def detect_fields(sample: dict[str, Any]) -> tuple[str | None, str | None]:
+        # Synchronous SDK call; run via asyncio.to_thread.
+        prompt = f"""
+Identify which fields represent quantity and price in this retail data.
+Data: {json.dumps(sample, indent=2)}
+
+Return JSON with exactly this structure:
+{{
+  "quantity_field": "<field_name_or_null>",
+  "price_field": "<field_name_or_null>"
+}}
+
+Only return the JSON, no other text.
+"""
+        response = app.state.gemini_client.models.generate_content(
+            model=settings.gemini_model,
+            contents=prompt,
+        )
+        result_text = (
+            response.text.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+        )
+        detection = json.loads(result_text)
+        return detection.get("quantity_field"), detection.get("price_field")
+
+    async def detect_and_store_mapping(session: AsyncSession, api_client_id, items):
+        # First ingest: detect fields from first object using AI
+        quantity_field = None
+        price_field = None
+        if items and app.state.gemini_client is not None:
+            try:
+                quantity_field, price_field = await asyncio.wait_for(
+                    asyncio.to_thread(detect_fields, items[0]),
+                    timeout=settings.gemini_timeout_seconds,
+                )
+            except Exception:
+                # Graceful fallback if detection fails or times out
+                pass
+        
+        # Store the detected (or null) mapping
+        return await create_field_mapping(session, api_client_id, quantity_field, price_field)
+
+    async def resolve_field_mapping(session: AsyncSession, api_client_id, items):
+        """Return the client's (quantity_field, price_field), detecting it from ``items`` on first use."""
+        fields = field_mapping_cache.get(api_client_id)
+        if fields is None:
+            field_mapping = await get_field_mapping(session, api_client_id)
+            if not field_mapping:
+                # Concurrent first ingests for one client share a single detection.
+                lock = detection_locks.setdefault(api_client_id, asyncio.Lock())
+                try:
+                    async with lock:
+                        field_mapping = await get_field_mapping(session, api_client_id)
+                        if not field_mapping:
+                            field_mapping = await detect_and_store_mapping(session, api_client_id, items)
+                finally:
+                    detection_locks.pop(api_client_id, None)
+            fields = (field_mapping.quantity_field, field_mapping.price_field)
+            field_mapping_cache.set(api_client_id, fields)
+        return fields
+
     @app.post(
         "/v1/bulk-ingest",
         response_model=BulkIngestResponse,
@@ -458,160 +605,224 @@ def create_app(
                 },
             },
         },
-    )
-    async def bulk_ingest(
-        items: list[dict[str, Any]] = Body(
-            ...,
-            examples={
-                "standard_fields": {
-                    "summary": "Standard field names (price, quantity)",
-                    "description": "First request for an organization with standard field names. "
-                    "AI will detect quantity_field='quantity' and price_field='price'.",
-                    "value": [
-                        {
-                            "sku": "SKU-001",
-                            "price": 19.99,
-                            "quantity": 50,
-                            "category": "pain relief",
-                            "date": "2026-01-23"
+        # The body is parsed with orjson in the handler rather than by a
+        # Body(...) parameter, so its schema and examples are declared here.
+        openapi_extra={
+            "requestBody": {
+                "required": True,
+                "content": {
+                    "application/json": {
+                        "schema": {
+                            "type": "array",
+                            "items": {"type": "object", "additionalProperties": True},
                         },
-                        {
-                            "sku": "SKU-002",
-                            "price": 24.99,
-                            "quantity": 30,
-                            "category": "vitamins",
-                            "date": "2026-01-23"
-                        }
-                    ],
-                },
-                "non_standard_fields": {
-                    "summary": "Non-standard field names (unit_price, quantity_available)",
-                    "description": "First request with alternative field names. "
-                    "AI will detect quantity_field='quantity_available' and price_field='unit_price'. "
-                    "Subsequent requests with same org can use any field name - the mapping is reused.",
-                    "value": [
-                        {
-                            "sku": "PROD-101",
-                            "unit_price": 49.99,
-                            "quantity_available": 15,
-                            "stock_status": "in stock",
-                            "supplier": "Supplier A"
+                        "examples": {
+                            "standard_fields": {
+                                "summary": "Standard field names (price, quantity)",
+                                "description": "First request for an organization with standard field names. "
+                                "AI will detect quantity_field='quantity' and price_field='price'.",
+                                "value": [
+                                    {
+                                        "sku": "SKU-001",
+                                        "price": 19.99,
+                                        "quantity": 50,
+                                        "category": "pain relief",
+                                        "date": "2026-01-23"
+                                    },
+                                    {
+                                        "sku": "SKU-002",
+                                        "price": 24.99,
+                                        "quantity": 30,
+                                        "category": "vitamins",
+                                        "date": "2026-01-23"
+                                    }
+                                ],
+                            },
+                            "non_standard_fields": {
+                                "summary": "Non-standard field names (unit_price, quantity_available)",
+                                "description": "First request with alternative field names. "
+                                "AI will detect quantity_field='quantity_available' and price_field='unit_price'. "
+                                "Subsequent requests with same org can use any field name - the mapping is reused.",
+                                "value": [
+                                    {
+                                        "sku": "PROD-101",
+                                        "unit_price": 49.99,
+                                        "quantity_available": 15,
+                                        "stock_status": "in stock",
+                                        "supplier": "Supplier A"
+                                    },
+                                    {
+                                        "sku": "PROD-102",
+                                        "unit_price": 34.99,
+                                        "quantity_available": 42,
+                                        "stock_status": "in stock",
+                                        "supplier": "Supplier B"
+                                    }
+                                ],
+                            },
+                            "update_existing": {
+                                "summary": "Update existing items (upsert)",
+                                "description": "Sending duplicate SKU with updated price/quantity. "
+                                "Matches existing record by all fields except price/quantity, then updates those fields.",
+                                "value": [
+                                    {
+                                        "sku": "SKU-001",
+                                        "price": 17.99,
+                                        "quantity": 60,
+                                        "category": "pain relief",
+                                        "date": "2026-01-23"
+                                    }
+                                ],
+                            },
+                            "varied_fields": {
+                                "summary": "Custom field names with mixed naming",
+                                "description": "Real-world example with completely custom field names. "
+                                "AI intelligently identifies cost as price and stock as quantity.",
+                                "value": [
+                                    {
+                                        "product_id": "P001",
+                                        "cost": 5.50,
+                                        "stock": 200,
+                                        "supplier": "Supplier A",
+                                        "warehouse": "NYC"
+                                    },
+                                    {
+                                        "product_id": "P002",
+                                        "cost": 7.25,
+                                        "stock": 150,
+                                        "supplier": "Supplier B",
+                                        "warehouse": "LA"
+                                    }
+                                ],
+                            }
                         },
-                        {
-                            "sku": "PROD-102",
-                            "unit_price": 34.99,
-                            "quantity_available": 42,
-                            "stock_status": "in stock",
-                            "supplier": "Supplier B"
-                        }
-                    ],
-                },
-                "update_existing": {
-                    "summary": "Update existing items (upsert)",
-                    "description": "Sending duplicate SKU with updated price/quantity. "
-                    "Matches existing record by all fields except price/quantity, then updates those fields.",
-                    "value": [
-                        {
-                            "sku": "SKU-001",
-                            "price": 17.99,
-                            "quantity": 60,
-                            "category": "pain relief",
-                            "date": "2026-01-23"
-                        }
-                    ],
+                    }
                 },
-                "varied_fields": {
-                    "summary": "Custom field names with mixed naming",
-                    "description": "Real-world example with completely custom field names. "
-                    "AI intelligently identifies cost as price and stock as quantity.",
-                    "value": [
-                        {
-                            "product_id": "P001",
-                            "cost": 5.50,
-                            "stock": 200,
-                            "supplier": "Supplier A",
-                            "warehouse": "NYC"
-                        },
-                        {
-                            "product_id": "P002",
-                            "cost": 7.25,
-                            "stock": 150,
-                            "supplier": "Supplier B",
-                            "warehouse": "LA"
-                        }
-                    ],
-                }
-            },
-        ),
+            }
+        },
+    )
+    async def bulk_ingest(
+        request: Request,
         client=Depends(get_api_client),
         session: AsyncSession = Depends(get_db_session),
-    ) -> BulkIngestResponse:
+    ) -> RawORJSONResponse:
+        # Parsed directly with orjson: validating each item as dict[str, Any]
+        # through pydantic would only repeat this isinstance pass.
+        try:
+            items = orjson.loads(await read_capped_body(request, settings.max_payload_bytes))
+        except orjson.JSONDecodeError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail="Request body must be valid JSON",
+            ) from exc
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail="Request body must be a JSON array of objects",
+            )
         if len(items) > settings.max_batch_size:
             raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
                 detail="Batch size exceeds limit",
             )
         
-        # Get or detect field mapping for this organization
-        field_mapping = await get_field_mapping(session, client.id)
-        
-        if not field_mapping:
-            # First ingest: detect fields from first object using AI
-            quantity_field = None
-            price_field = None
-            
-            if items and settings.gemini_api_key:
-                # Use Gemini to detect field names
-                from google import genai
-                import json
-                
-                try:
-                    client_gemini = genai.Client(api_key=settings.gemini_api_key)
-                    sample = items[0]
-                    
-                    prompt = f"""
-Identify which fields represent quantity and price in this retail data.
-Data: {json.dumps(sample, indent=2)}
-
-Return JSON with exactly this structure:
-{{
-  "quantity_field": "<field_name_or_null>",
-  "price_field": "<field_name_or_null>"
-}}
-
-Only return the JSON, no other text.
-"""
-                    response = client_gemini.models.generate_content(
-                        model=settings.gemini_model,
-                        contents=prompt,
-                    )
-                    result_text = response.text.strip()
-                    if result_text.startswith("```json"):
-                        result_text = result_text[7:]
-                    if result_text.startswith("```"):
-                        result_text = result_text[3:]
-                    if result_text.endswith("```"):
-                        result_text = result_text[:-3]
-                    
-                    detection = json.loads(result_text)
-                    quantity_field = detection.get("quantity_field")
-                    price_field = detection.get("price_field")
-                except Exception:
-                    # Graceful fallback if detection fails
-                    pass
-            
-            # Store the detected (or null) mapping
-            await create_field_mapping(session, client.id, quantity_field, price_field)
-        else:
-            # Reuse stored mapping
-            quantity_field = field_mapping.quantity_field
-            price_field = field_mapping.price_field
+        # Apply the stored (or just detected) mapping
+        quantity_field, price_field = await resolve_field_mapping(session, client.id, items)
         
         # Ingest using detected fields
         processed = await bulk_upsert_items(
-            session, client.id, items, quantity_field=quantity_field, price_field=price_field
+            session,
+            client.id,
+            items,
+            quantity_field=quantity_field,
+            price_field=price_field,
+            statement_timeout_ms=settings.db_bulk_statement_timeout_ms,
         )
-        return BulkIngestResponse(processed=processed)
+        return RawORJSONResponse({"processed": processed})
+
+    @app.post(
+        NDJSON_INGEST_PATH,
+        response_model=BulkIngestResponse,
+        tags=["Ingest"],
+        summary="Bulk ingest newline-delimited JSON",
+        description=(
+            "Same upsert and field detection as /v1/bulk-ingest, for one JSON object per line "
+            "(`Content-Type: application/x-ndjson`). Lines are parsed as they arrive and upserted "
+            f"in pages of {BULK_UPSERT_PAGE_SIZE}, so large batches never sit in memory at once "
+            "and there is no per-request item limit.\n\n"
+            "Each page is committed when it is written. If a later line is malformed the request "
+            "fails with 422 and the earlier pages stay stored. Upserts are idempotent, so the whole "
+            "body can simply be sent again."
+        ),
+        responses={
+            200: {
+                "description": "Batch successfully processed.",
+                "content": {"application/json": {"example": {"processed": 2}}},
+            },
+            422: {
+                "description": "A line is not a JSON object.",
+                "content": {
+                    "application/json": {"example": {"detail": "Each line must be a JSON object"}}
+                },
+            },
+        },
+        openapi_extra={
+            "requestBody": {
+                "required": True,
+                "content": {
+                    "application/x-ndjson": {
+                        "schema": {"type": "string"},
+                        "example": (
+                            '{"sku": "SKU-1", "price": 10.5, "quantity": 2}\n'
+                            '{"sku": "SKU-2", "price": 4, "quantity": 10}\n'
+                        ),
+                    }
+                },
+            }
+        },
+    )
+    async def bulk_ingest_ndjson(
+        request: Request,
+        client=Depends(get_api_client),
+        session: AsyncSession = Depends(get_db_session),
+    ) -> RawORJSONResponse:
+        processed = 0
+        fields = None
+        page: list[dict[str, Any]] = []
+        lines = iter_ndjson(request, settings.max_payload_bytes)
+        while True:
+            try:
+                item = await anext(lines, None)
+            except orjson.JSONDecodeError as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    detail="Each line must be valid JSON",
+                ) from exc
+            if item is not None:
+                if not isinstance(item, dict):
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                        detail="Each line must be a JSON object",
+                    )
+                page.append(item)
+                if len(page) < BULK_UPSERT_PAGE_SIZE:
+                    continue
+            if page:
+                if fields is None:
+                    fields = await resolve_field_mapping(session, client.id, page)
+                quantity_field, price_field = fields
+                processed += await bulk_upsert_items(
+                    session,
+                    client.id,
+                    page,
+                    quantity_field=quantity_field,
+                    price_field=price_field,
+                    statement_timeout_ms=settings.db_bulk_statement_timeout_ms,
+                )
+                page = []
+            if item is None:
+                break
+        return RawORJSONResponse({"processed": processed})
 
     @app.get(
         "/v1/automation/batch",
@@ -648,9 +859,51 @@ Only return the JSON, no other text.
         limit: int = Query(100, ge=1, le=1000),
         client=Depends(get_token_client),
         session: AsyncSession = Depends(get_db_session),
-    ) -> AutomationBatchResponse:
-        items = await fetch_automation_batch(session, client.id, limit)
-        return AutomationBatchResponse(items=items)
+    ) -> RawORJSONResponse:
+        items = await fetch_automation_batch(
+            session, client.id, limit, settings.db_bulk_statement_timeout_ms
+        )
+        return RawORJSONResponse({"items": items})
+
+    @app.get(
+        "/v1/automation/batch.ndjson",
+        tags=["Automation"],
+        summary="Stream a batch for automation as NDJSON",
+        description=(
+            "Same batch as /v1/automation/batch, written as one JSON object per line "
+            "while rows are read from the database. The batch is only marked exported "
+            "once the whole stream has been sent."
+        ),
+        response_class=StreamingResponse,
+        responses={
+            200: {
+                "description": "Automation batch, one item per line.",
+                "content": {
+                    "application/x-ndjson": {
+                        "example": (
+                            '{"id":"uuid","data":{"sku":"SKU-1","price":10.5},"price":10.5,'
+                            '"quantity":2.0,"created_at":"2026-01-21T10:00:00Z",'
+                            '"updated_at":"2026-01-21T10:00:00Z"}\n'
+                        )
+                    }
+                },
+            }
+        },
+    )
+    async def automation_batch_ndjson(
+        limit: int = Query(100, ge=1, le=1000),
+        client=Depends(get_token_client),
+        session: AsyncSession = Depends(get_db_session),
+    ) -> StreamingResponse:
+        async def lines():
+            # The request's session stays open until the body has been sent, so
+            # the stream reuses its connection; the claim commits after the last row.
+            async for row in stream_automation_batch(
+                session, client.id, limit, settings.db_bulk_statement_timeout_ms
+            ):
+                yield dump_json(row) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
 
     return app
 
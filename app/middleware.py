@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.rate_limit import RateLimiter
+
+# FastAPI's interactive docs and schema stay reachable from any host.
+DOCS_PATHS = frozenset({"/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"})
+INGEST_PATH = "/v1/bulk-ingest"
+# Streamed line by line, so its size is not capped by Content-Length.
+NDJSON_INGEST_PATH = "/v1/bulk-ingest.ndjson"
+# Machine-to-machine callers that authenticate by API key skip the browser guards.
+GUARD_EXEMPT_PATHS = frozenset({INGEST_PATH, NDJSON_INGEST_PATH})
+
+
+async def _reject(
+    scope: Scope,
+    receive: Receive,
+    send: Send,
+    status_code: int,
+    detail: str,
+    headers: dict[str, str] | None = None,
+) -> None:
+    # Sent directly: this middleware sits outside FastAPI's exception handling,
+    # so a raised HTTPException would reach the client as a 500.
+    response = ORJSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+    await response(scope, receive, send)
+
+
+class GuardMiddleware:
+    """Payload size, host and origin guards plus rate limiting, as plain ASGI.
+
+    A single pass per request, without the task and memory streams that
+    ``@app.middleware("http")`` adds. It also opens the request's database session,
+    which get_db_session picks up from ``request.state``, so each request checks
+    out at most one connection.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        sessionmaker: async_sessionmaker,
+        rate_limiter: RateLimiter,
+        origin_re: re.Pattern[str],
+        allowed_host_suffix: str,
+        max_payload_bytes: int,
+    ) -> None:
+        self.app = app
+        self.sessionmaker = sessionmaker
+        self.rate_limiter = rate_limiter
+        self.origin_re = origin_re
+        self.allowed_host_suffix = allowed_host_suffix
+        self.max_payload_bytes = max_payload_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in DOCS_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        if path == INGEST_PATH:
+            # Refuse oversized bodies before they are read and parsed.
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_payload_bytes:
+                await _reject(
+                    scope, receive, send, status.HTTP_413_CONTENT_TOO_LARGE, "Payload too large"
+                )
+                return
+
+        if path not in GUARD_EXEMPT_PATHS:
+            # Compare the hostname only; a port in the Host header is not part of it.
+            host = request.headers.get("host", "").partition(":")[0]
+            if host and not host.endswith(self.allowed_host_suffix):
+                await _reject(scope, receive, send, status.HTTP_403_FORBIDDEN, "Host not allowed")
+                return
+
+            origin = request.headers.get("origin")
+            if origin and not self.origin_re.fullmatch(origin):
+                await _reject(scope, receive, send, status.HTTP_403_FORBIDDEN, "Origin not allowed")
+                return
+
+        async with self.sessionmaker() as session:
+            request.state.db_session = session
+            retry_after = await self.rate_limiter.check(request, session)
+            if retry_after is not None:
+                await _reject(
+                    scope,
+                    receive,
+                    send,
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    "Rate limit exceeded",
+                    headers={"Retry-After": str(retry_after)},
+                )
+                return
+            await self.app(scope, receive, send)
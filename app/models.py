@@ -1,28 +1,47 @@
 import uuid
 from datetime import UTC, datetime
 
-from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Numeric, String, UniqueConstraint
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Index, LargeBinary, Numeric, String, UniqueConstraint, func, text
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy import Uuid
 
 
+class UTCDateTime(TypeDecorator):
+    """Timezone-aware timestamp that always reads back as an aware UTC datetime.
+
+    Postgres already returns aware values; SQLite drops the offset, and every
+    value is written as UTC, so naive results are tagged on the way out.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_result_value(self, value: datetime | None, dialect) -> datetime | None:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=UTC)
+        return value
+
+
 class Base(DeclarativeBase):
     pass
 
 
 class ApiClient(Base):
     __tablename__ = "api_clients"
+    __table_args__ = (
+        Index("ix_api_clients_api_key_sha_hash", "api_key_sha", postgresql_using="hash"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
-    email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    email: Mapped[str] = mapped_column(String(255), unique=True)
     org_name: Mapped[str] = mapped_column(String(255))
     distributor_id: Mapped[str] = mapped_column(String(255), unique=True, index=True)
-    api_key_hash: Mapped[str] = mapped_column(String(255))
-    api_key_sha: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    api_key_sha: Mapped[bytes] = mapped_column(LargeBinary(32), unique=True)
     password_hash: Mapped[str] = mapped_column(String(255))
-    password_salt: Mapped[str] = mapped_column(String(255))
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
-    last_api_key_reset_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(), server_default=func.now())
+    last_api_key_reset_at: Mapped[datetime | None] = mapped_column(UTCDateTime(), nullable=True)
 
     items: Mapped[list["StoreItem"]] = relationship(back_populates="api_client")
     tokens: Mapped[list["AccessToken"]] = relationship(back_populates="api_client")
@@ -33,29 +52,43 @@ class StoreItem(Base):
     __tablename__ = "store_items"
     __table_args__ = (
         UniqueConstraint("api_client_id", "fingerprint", name="uq_store_item_fingerprint"),
+        Index(
+            "ix_store_items_pending",
+            "api_client_id",
+            "created_at",
+            postgresql_where=text("is_exported = false"),
+        ),
     )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
     api_client_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("api_clients.id"), index=True)
-    fingerprint: Mapped[str] = mapped_column(String(64), index=True)
-    data: Mapped[dict] = mapped_column(JSON)
+    fingerprint: Mapped[str] = mapped_column(String(32))
+    data: Mapped[dict] = mapped_column(JSON().with_variant(JSONB(), "postgresql"))
     price: Mapped[float | None] = mapped_column(Numeric(18, 4), nullable=True)
     quantity: Mapped[float | None] = mapped_column(Numeric(18, 4), nullable=True)
     is_exported: Mapped[bool] = mapped_column(Boolean, default=False)
-    exported_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    exported_at: Mapped[datetime | None] = mapped_column(UTCDateTime(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(), server_default=func.now())
+    # Only ingest moves updated_at; exporting a row must not look like a change.
+    updated_at: Mapped[datetime] = mapped_column(UTCDateTime(), server_default=func.now())
 
     api_client: Mapped[ApiClient] = relationship(back_populates="items")
 
 
 class AccessToken(Base):
     __tablename__ = "access_tokens"
+    __table_args__ = (
+        Index(
+            "ix_access_tokens_token_sha_covering",
+            "token_sha",
+            postgresql_include=["api_client_id"],
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
     api_client_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("api_clients.id"), index=True)
-    token_sha: Mapped[str] = mapped_column(String(64), unique=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    token_sha: Mapped[bytes] = mapped_column(LargeBinary(32), unique=True)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(), server_default=func.now())
 
     api_client: Mapped[ApiClient] = relationship(back_populates="tokens")
 
@@ -65,9 +98,9 @@ class PasswordResetToken(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
     api_client_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("api_clients.id"), index=True)
-    token_sha: Mapped[str] = mapped_column(String(64), unique=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
-    used_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    token_sha: Mapped[bytes] = mapped_column(LargeBinary(32), unique=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(), server_default=func.now())
+    used_at: Mapped[datetime | None] = mapped_column(UTCDateTime(), nullable=True)
 
     api_client: Mapped[ApiClient] = relationship(back_populates="reset_tokens")
 
@@ -82,6 +115,6 @@ class FieldMapping(Base):
     api_client_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("api_clients.id"), index=True)
     quantity_field: Mapped[str | None] = mapped_column(String(255), nullable=True)
     price_field: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    detected_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    detected_at: Mapped[datetime] = mapped_column(UTCDateTime(), server_default=func.now())
 
     api_client: Mapped[ApiClient] = relationship()
@@ -1,18 +1,24 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Optional
 
-from fastapi import HTTPException, Request, status
+from fastapi import Request
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import api_key_sha, token_sha
+from app.cache import TTLCache
 from app.models import AccessToken, ApiClient
 from app.settings import Settings
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class RateLimitEntry:
@@ -20,12 +26,31 @@ class RateLimitEntry:
     count: int
 
 
+# Fixed-window counter: one round trip that increments and, on the window's
+# first hit, sets the key to expire with it.
+_REDIS_INCR_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+  redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+
 class RateLimiter:
-    def __init__(self, settings: Settings) -> None:
+    """Per client and IP request limit over a fixed window.
+
+    Counts live in this process unless a Redis client is given, in which case
+    every worker shares them and no in-process lock is taken. If Redis cannot
+    be reached the check falls back to the in-process counters.
+    """
+
+    def __init__(self, settings: Settings, redis: Any | None = None) -> None:
         self.settings = settings
         self._lock = asyncio.Lock()
         self._entries: dict[str, RateLimitEntry] = {}
-        self._client_cache: dict[str, tuple[str, float]] = {}
+        self._client_cache: TTLCache[str] = TTLCache(settings.rate_limit_cache_size, ttl=60)
+        self._redis_incr = redis.register_script(_REDIS_INCR_SCRIPT) if redis is not None else None
 
     async def resolve_client_id(self, session: AsyncSession, request: Request) -> Optional[str]:
         api_key = request.headers.get("X-API-Key")
@@ -40,55 +65,45 @@ class RateLimiter:
         return None
 
     async def _lookup_api_key(self, session: AsyncSession, api_key: str) -> Optional[str]:
-        cache_key = f"api:{api_key}" 
-        cached = self._get_cached(cache_key)
+        # Keyed by digest so raw credentials are never held in the cache.
+        key_sha = api_key_sha(api_key)
+        cached = self._client_cache.get(("api", key_sha))
         if cached:
             return cached
 
-        key_sha = api_key_sha(api_key)
         result = await session.execute(select(ApiClient.id).where(ApiClient.api_key_sha == key_sha))
         client_id = result.scalar_one_or_none()
         if client_id:
-            self._set_cached(cache_key, str(client_id))
+            self._client_cache.set(("api", key_sha), str(client_id))
         return str(client_id) if client_id else None
 
     async def _lookup_token(self, session: AsyncSession, token: str) -> Optional[str]:
-        cache_key = f"token:{token}"
-        cached = self._get_cached(cache_key)
+        token_hash = token_sha(token)
+        cached = self._client_cache.get(("token", token_hash))
         if cached:
             return cached
 
-        token_hash = token_sha(token)
+        # Same index-only probe as get_token_client; the foreign key already
+        # guarantees the client row exists, so there is nothing to join.
         result = await session.execute(
-            select(ApiClient.id)
-            .join(AccessToken, AccessToken.api_client_id == ApiClient.id)
-            .where(AccessToken.token_sha == token_hash)
+            select(AccessToken.api_client_id).where(AccessToken.token_sha == token_hash)
         )
         client_id = result.scalar_one_or_none()
         if client_id:
-            self._set_cached(cache_key, str(client_id))
+            self._client_cache.set(("token", token_hash), str(client_id))
         return str(client_id) if client_id else None
 
-    def _get_cached(self, key: str) -> Optional[str]:
-        cached = self._client_cache.get(key)
-        if not cached:
-            return None
-        value, expires_at = cached
-        if time.time() > expires_at:
-            self._client_cache.pop(key, None)
-            return None
-        return value
-
-    def _set_cached(self, key: str, value: str) -> None:
-        self._client_cache[key] = (value, time.time() + 60)
-
     def _get_ip(self, request: Request) -> str:
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return forwarded.split(",", 1)[0].strip()
+        if self.settings.trust_forwarded:
+            # The last hop is the one our proxy appended; anything before it
+            # came from the client and can be spoofed.
+            forwarded = request.headers.get("X-Forwarded-For")
+            if forwarded:
+                return forwarded.rsplit(",", 1)[-1].strip()
         return request.client.host if request.client else "unknown"
 
-    async def check(self, request: Request, session: AsyncSession) -> None:
+    async def check(self, request: Request, session: AsyncSession) -> Optional[int]:
+        """Count the request; return its Retry-After seconds if over the limit, else None."""
         ip = self._get_ip(request)
         client_id = await self.resolve_client_id(session, request)
         key = f"{client_id or 'anon'}:{ip}"
@@ -97,18 +112,27 @@ class RateLimiter:
         window = self.settings.rate_limit_window_seconds
         limit = self.settings.rate_limit_requests
 
+        if self._redis_incr is not None:
+            bucket = int(now // window)
+            try:
+                count = await self._redis_incr(keys=[f"rl:{key}:{bucket}"], args=[window * 1000])
+            except (RedisConnectionError, RedisTimeoutError) as exc:
+                # Fail open onto this worker's own counters rather than turning
+                # a Redis outage into a 500 for every request.
+                logger.warning("Redis rate limiting unavailable, counting in-process: %s", exc)
+            else:
+                if count > limit:
+                    return max(1, int((bucket + 1) * window - now))
+                return None
+
         async with self._lock:
             entry = self._entries.get(key)
             if not entry or now - entry.window_start >= window:
                 self._entries[key] = RateLimitEntry(window_start=now, count=1)
-                return
+                return None
 
             if entry.count >= limit:
-                retry_after = max(1, int(window - (now - entry.window_start)))
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded",
-                    headers={"Retry-After": str(retry_after)},
-                )
-
-            entry.count += 1
\ No newline at end of file
+                return max(1, int(window - (now - entry.window_start)))
+
+            entry.count += 1
+            return None
\ No newline at end of file
@@ -1,45 +1,52 @@
 import hashlib
+from collections.abc import Callable
+from functools import lru_cache
 from typing import Any
 
 import orjson
 
 
-def sanitize_payload(payload: Any, price_field: str | None = None, quantity_field: str | None = None) -> Any:
-    """Remove price and quantity fields from payload for fingerprinting.
-    
-    Only excludes the specific fields detected by AI, not hardcoded variants.
-    This ensures unique identification per organization based on their actual field names.
-    """
-    if not isinstance(payload, dict):
-        return payload
-    
-    excluded = set()
-    
-    # Exclude only the detected/specified price field
-    if price_field:
-        excluded.add(price_field)
-    
-    # Exclude only the detected/specified quantity field
-    if quantity_field:
-        excluded.add(quantity_field)
-    
+@lru_cache(maxsize=256)
+def _excluded_fields(price_field: str | None, quantity_field: str | None) -> frozenset[str]:
+    # Every row of a batch shares one (price_field, quantity_field) pair.
+    excluded = frozenset(field for field in (price_field, quantity_field) if field)
+
     # If no fields detected, exclude common defaults
-    if not excluded:
-        excluded = {"price", "quantity"}
-    
-    return {key: value for key, value in payload.items() if key not in excluded}
+    return excluded or frozenset({"price", "quantity"})
+
+
+def compute_fingerprint(
+    payload: dict[str, Any], price_field: str | None = None, quantity_field: str | None = None
+) -> str:
+    """Fingerprint a single payload; see make_fingerprinter."""
+    return make_fingerprinter(price_field, quantity_field)(payload)
 
 
-def compute_fingerprint(payload: Any, price_field: str | None = None, quantity_field: str | None = None) -> str:
-    """Compute fingerprint excluding ONLY the detected price/quantity fields.
-    
-    This allows proper deduplication based on all non-price/quantity fields.
+def make_fingerprinter(
+    price_field: str | None = None, quantity_field: str | None = None
+) -> Callable[[dict[str, Any]], str]:
+    """Return a fingerprint function for dict payloads under one field mapping.
+
+    The fingerprint covers every field except the detected price/quantity ones,
+    so re-sent objects land on the same row:
     - If fields are detected by AI: excludes only those specific fields
     - If not detected: excludes common defaults ("price", "quantity")
+
+    Bulk ingest fingerprints every row of a page with the same mapping, so the
+    exclusion set and the callables are resolved once instead of per row.
     """
-    sanitized = sanitize_payload(payload, price_field, quantity_field)
-    raw = orjson.dumps(sanitized, option=orjson.OPT_SORT_KEYS)
-    return hashlib.sha256(raw).hexdigest()
+    excluded = _excluded_fields(price_field, quantity_field)
+    dumps = orjson.dumps
+    sort_keys = orjson.OPT_SORT_KEYS
+    # Copying a configured hasher skips re-parsing the constructor arguments per row.
+    empty_hasher = hashlib.blake2b(digest_size=16)
+
+    def fingerprint(payload: dict[str, Any]) -> str:
+        hasher = empty_hasher.copy()
+        hasher.update(dumps({key: value for key, value in payload.items() if key not in excluded}, option=sort_keys))
+        return hasher.hexdigest()
+
+    return fingerprint
 
 
 def extract_number(payload: Any, key: str) -> float | None:
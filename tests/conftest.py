@@ -1,4 +1,5 @@
 import asyncio
+from contextlib import AsyncExitStack
 from typing import AsyncGenerator
 
 import pytest
@@ -53,6 +54,24 @@ async def session(engine) -> AsyncGenerator[AsyncSession, None]:
 async def client(test_settings, engine):
     sessionmaker = create_sessionmaker(engine)
     app = create_app(test_settings, engine=engine, sessionmaker=sessionmaker)
-    transport = ASGITransport(app=app)
+    # Unhandled exceptions become 500 responses, as a real server sends them.
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
     async with AsyncClient(transport=transport, base_url="http://app.usepharmacyos.com") as client:
         yield client
+
+
+@pytest_asyncio.fixture
+async def make_client(test_settings, engine):
+    """Build clients for apps whose settings override the test defaults."""
+    async with AsyncExitStack() as stack:
+
+        async def make(**overrides) -> AsyncClient:
+            settings = test_settings.model_copy(update=overrides)
+            app = create_app(settings, engine=engine, sessionmaker=create_sessionmaker(engine))
+            # Unhandled exceptions become 500 responses, as a real server sends them.
+            transport = ASGITransport(app=app, raise_app_exceptions=False)
+            return await stack.enter_async_context(
+                AsyncClient(transport=transport, base_url="http://app.usepharmacyos.com")
+            )
+
+        yield make
@@ -1,6 +1,15 @@
+import json
 import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+from uuid import UUID
 
 import pytest
+from asyncpg.pgproto.pgproto import UUID as AsyncpgUUID
+from sqlalchemy import delete, event, select, update
+
+from app.main import orjson_default
+from app.models import AccessToken, PasswordResetToken, StoreItem
 
 
 @pytest.mark.asyncio
@@ -41,3 +50,217 @@ async def test_automation_batch(client):
     assert response.status_code == 200
     data = response.json()
     assert len(data["items"]) == 1
+    assert data["items"][0]["price"] == 15.0
+    assert data["items"][0]["created_at"].endswith("Z")
+
+
+@pytest.mark.asyncio
+async def test_automation_batch_ndjson(client):
+    email = f"auto-ndjson-{uuid.uuid4()}@example.com"
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Auto NDJSON Org",
+            "distributor_id": f"dist_{uuid.uuid4().hex[:8]}",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+    token_response = await client.post(
+        "/v1/auth/token",
+        json={"email": email, "password": "StrongPass123"},
+    )
+    access_token = token_response.json()["access_token"]
+
+    payload = [
+        {"sku": "SKU-3", "price": 15, "quantity": 2},
+        {"sku": "SKU-4", "price": 7.5, "quantity": 1},
+    ]
+    await client.post(
+        "/v1/bulk-ingest",
+        json=payload,
+        headers={"X-API-Key": api_key},
+    )
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = await client.get("/v1/automation/batch.ndjson", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # Items from one ingest share created_at, so their relative order is not fixed.
+    by_sku = {line["data"]["sku"]: line for line in lines}
+    assert sorted(by_sku) == ["SKU-3", "SKU-4"]
+    assert by_sku["SKU-3"]["price"] == 15.0
+
+    # The streamed batch was claimed, so nothing is left for the next poll.
+    response = await client.get("/v1/automation/batch", headers=headers)
+    assert response.json()["items"] == []
+
+
+@pytest.mark.asyncio
+async def test_automation_batch_caches_token_lookup(client, session):
+    email = f"auto-cache-{uuid.uuid4()}@example.com"
+    await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Auto Cache Org",
+            "distributor_id": f"dist_{uuid.uuid4().hex[:8]}",
+            "password": "StrongPass123",
+        },
+    )
+    token_response = await client.post(
+        "/v1/auth/token",
+        json={"email": email, "password": "StrongPass123"},
+    )
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+
+    assert (await client.get("/v1/automation/batch", headers=headers)).status_code == 200
+
+    # Once resolved, the token is served from the cache without touching the table.
+    await session.execute(delete(AccessToken))
+    await session.commit()
+    assert (await client.get("/v1/automation/batch", headers=headers)).status_code == 200
+
+    client._transport.app.state.token_cache.clear()
+    assert (await client.get("/v1/automation/batch", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_automation_claim_keeps_updated_at(client, session):
+    email = f"auto-updated-{uuid.uuid4()}@example.com"
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Auto Updated Org",
+            "distributor_id": f"dist_{uuid.uuid4().hex[:8]}",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+    client_id = UUID(register.json()["client_id"])
+    token_response = await client.post(
+        "/v1/auth/token",
+        json={"email": email, "password": "StrongPass123"},
+    )
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+
+    await client.post(
+        "/v1/bulk-ingest",
+        json=[{"sku": "SKU-5", "price": 3, "quantity": 1}],
+        headers={"X-API-Key": api_key},
+    )
+    # Backdate the ingest so an export-time write would be visible.
+    ingested_at = datetime(2026, 1, 1, tzinfo=UTC)
+    await session.execute(
+        update(StoreItem).where(StoreItem.api_client_id == client_id).values(updated_at=ingested_at)
+    )
+    await session.commit()
+
+    response = await client.get("/v1/automation/batch", headers=headers)
+    assert response.json()["items"][0]["updated_at"] == "2026-01-01T00:00:00Z"
+
+    session.expire_all()
+    result = await session.execute(
+        select(StoreItem.is_exported, StoreItem.updated_at).where(StoreItem.api_client_id == client_id)
+    )
+    is_exported, updated_at = result.one()
+    assert is_exported
+    assert updated_at == ingested_at
+
+
+@pytest.mark.asyncio
+async def test_automation_batch_ndjson_uses_one_connection(client, engine):
+    email = f"auto-conn-{uuid.uuid4()}@example.com"
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Auto Conn Org",
+            "distributor_id": f"dist_{uuid.uuid4().hex[:8]}",
+            "password": "StrongPass123",
+        },
+    )
+    token_response = await client.post(
+        "/v1/auth/token",
+        json={"email": email, "password": "StrongPass123"},
+    )
+    await client.post(
+        "/v1/bulk-ingest",
+        json=[{"sku": "SKU-6", "price": 1, "quantity": 1}],
+        headers={"X-API-Key": register.json()["api_key"]},
+    )
+    client._transport.app.state.token_cache.clear()
+
+    checked_out = 0
+    peak = 0
+
+    def on_checkout(*args):
+        nonlocal checked_out, peak
+        checked_out += 1
+        peak = max(peak, checked_out)
+
+    def on_checkin(*args):
+        nonlocal checked_out
+        checked_out -= 1
+
+    pool = engine.sync_engine.pool
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    try:
+        response = await client.get(
+            "/v1/automation/batch.ndjson",
+            headers={"Authorization": f"Bearer {token_response.json()['access_token']}"},
+        )
+    finally:
+        event.remove(pool, "checkout", on_checkout)
+        event.remove(pool, "checkin", on_checkin)
+    assert len(response.text.splitlines()) == 1
+    assert peak == 1
+
+
+@pytest.mark.asyncio
+async def test_startup_warmup_leaves_rows_unchanged(client, session):
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"auto-warm-{uuid.uuid4()}@example.com",
+            "org_name": "Auto Warm Org",
+            "distributor_id": f"dist_{uuid.uuid4().hex[:8]}",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+    await client.post(
+        "/v1/bulk-ingest",
+        json=[{"sku": f"SKU-{index}", "price": index, "quantity": 1} for index in range(3)],
+        headers={"X-API-Key": api_key},
+    )
+
+    async def snapshot():
+        session.expire_all()
+        items = await session.execute(
+            select(StoreItem.id, StoreItem.data, StoreItem.is_exported, StoreItem.updated_at)
+            .order_by(StoreItem.id)
+        )
+        tokens = await session.execute(select(PasswordResetToken.id))
+        await session.rollback()
+        return items.all(), tokens.all()
+
+    before = await snapshot()
+    app = client._transport.app
+    async with app.router.lifespan_context(app):
+        pass
+
+    assert await snapshot() == before
+    assert not any(row.is_exported for row in before[0])
+
+
+def test_orjson_default_handles_decimal_and_uuid_only():
+    value = "12345678-1234-5678-1234-567812345678"
+    assert orjson_default(Decimal("4.50")) == 4.5
+    assert orjson_default(AsyncpgUUID(value)) == value
+    with pytest.raises(TypeError):
+        orjson_default(b"raw")
@@ -1,6 +1,14 @@
+import asyncio
+import time
 import uuid
+from types import SimpleNamespace
+from uuid import UUID
 
 import pytest
+from sqlalchemy import select
+
+from app.crud import BULK_UPSERT_PAGE_SIZE, create_field_mapping
+from app.models import FieldMapping, StoreItem
 
 
 @pytest.mark.asyncio
@@ -28,3 +36,281 @@ async def test_bulk_ingest(client):
     )
     assert response.status_code == 200
     assert response.json()["processed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_updates_existing_items(client, session):
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-update-{uuid.uuid4()}@example.com",
+            "org_name": "Bulk Update Org",
+            "distributor_id": "dist_bulk_update",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+    client_id = UUID(register.json()["client_id"])
+
+    first = [
+        {"sku": "SKU-1", "price": 10, "quantity": 5},
+        {"sku": "SKU-2", "price": 20, "quantity": 1},
+    ]
+    second = [
+        {"sku": "SKU-1", "price": 11, "quantity": 4},
+        {"sku": "SKU-3", "price": 30, "quantity": 2},
+    ]
+    for payload in (first, second):
+        response = await client.post(
+            "/v1/bulk-ingest",
+            json=payload,
+            headers={"X-API-Key": api_key},
+        )
+        assert response.status_code == 200
+
+    result = await session.execute(
+        select(StoreItem).where(StoreItem.api_client_id == client_id)
+    )
+    items = {item.data["sku"]: item for item in result.scalars().all()}
+    assert sorted(items) == ["SKU-1", "SKU-2", "SKU-3"]
+    assert float(items["SKU-1"].price) == 11
+    assert float(items["SKU-1"].quantity) == 4
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_dedups_across_pages(client, session):
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-pages-{uuid.uuid4()}@example.com",
+            "org_name": "Bulk Pages Org",
+            "distributor_id": "dist_bulk_pages",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+    client_id = UUID(register.json()["client_id"])
+
+    payload = [{"sku": f"SKU-{index}", "price": 1, "quantity": 1} for index in range(BULK_UPSERT_PAGE_SIZE)]
+    # Lands on the second page and matches a row committed by the first.
+    payload.append({"sku": "SKU-0", "price": 9, "quantity": 3})
+
+    response = await client.post(
+        "/v1/bulk-ingest",
+        json=payload,
+        headers={"X-API-Key": api_key},
+    )
+    assert response.status_code == 200
+    assert response.json()["processed"] == BULK_UPSERT_PAGE_SIZE + 1
+
+    result = await session.execute(select(StoreItem).where(StoreItem.api_client_id == client_id))
+    items = {item.data["sku"]: item for item in result.scalars().all()}
+    assert len(items) == BULK_UPSERT_PAGE_SIZE
+    assert (float(items["SKU-0"].price), float(items["SKU-0"].quantity)) == (9, 3)
+
+
+class _SlowGemini:
+    def __init__(self):
+        self.calls = 0
+        self.models = self
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        time.sleep(0.2)
+        return SimpleNamespace(text='```json\n{"quantity_field": "stock", "price_field": "cost"}\n```')
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_ingests_share_one_detection(client, session):
+    gemini = _SlowGemini()
+    client._transport.app.state.gemini_client = gemini
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-detect-{uuid.uuid4()}@example.com",
+            "org_name": "Detect Org",
+            "distributor_id": "dist_bulk_detect",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+
+    responses = await asyncio.gather(
+        *[
+            client.post(
+                "/v1/bulk-ingest",
+                json=[{"sku": f"SKU-{index}", "cost": 4.5, "stock": 9}],
+                headers={"X-API-Key": api_key},
+            )
+            for index in range(3)
+        ]
+    )
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert gemini.calls == 1
+
+    mapping = await session.scalar(
+        select(FieldMapping).where(FieldMapping.api_client_id == UUID(register.json()["client_id"]))
+    )
+    assert (mapping.quantity_field, mapping.price_field) == ("stock", "cost")
+
+
+class _RacingGemini:
+    """Another worker stores its mapping while this one is still detecting."""
+
+    def __init__(self, store_competitor):
+        self.loop = asyncio.get_running_loop()
+        self.store_competitor = store_competitor
+        self.models = self
+
+    def generate_content(self, model, contents):
+        asyncio.run_coroutine_threadsafe(self.store_competitor(), self.loop).result()
+        return SimpleNamespace(text='{"quantity_field": "stock", "price_field": "cost"}')
+
+
+@pytest.mark.asyncio
+async def test_field_mapping_cache_keeps_first_stored_mapping(client, session):
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-race-{uuid.uuid4()}@example.com",
+            "org_name": "Race Org",
+            "distributor_id": "dist_bulk_race",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+    client_id = UUID(register.json()["client_id"])
+    app = client._transport.app
+    app.state.gemini_client = _RacingGemini(
+        lambda: create_field_mapping(session, client_id, "qty", "unit_price")
+    )
+
+    response = await client.post(
+        "/v1/bulk-ingest",
+        json=[{"sku": "SKU-1", "cost": 1, "stock": 2, "unit_price": 5, "qty": 7}],
+        headers={"X-API-Key": api_key},
+    )
+    assert response.status_code == 200
+
+    assert app.state.field_mapping_cache.get(client_id) == ("qty", "unit_price")
+    session.expire_all()
+    mapping = await session.scalar(select(FieldMapping).where(FieldMapping.api_client_id == client_id))
+    assert (mapping.quantity_field, mapping.price_field) == ("qty", "unit_price")
+    item = await session.scalar(select(StoreItem).where(StoreItem.api_client_id == client_id))
+    assert (float(item.price), float(item.quantity)) == (5, 7)
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_rejects_oversized_body_before_parsing(make_client):
+    client = await make_client(max_payload_bytes=1024)
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-large-{uuid.uuid4()}@example.com",
+            "org_name": "Large Org",
+            "distributor_id": "dist_bulk_large",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+
+    response = await client.post(
+        "/v1/bulk-ingest",
+        json=[{"sku": f"SKU-{index}", "price": 1} for index in range(100)],
+        headers={"X-API-Key": api_key},
+    )
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Payload too large"}
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_rejects_oversized_chunked_body(make_client):
+    client = await make_client(max_payload_bytes=1024)
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-chunked-{uuid.uuid4()}@example.com",
+            "org_name": "Chunked Org",
+            "distributor_id": "dist_bulk_chunked",
+            "password": "StrongPass123",
+        },
+    )
+    api_key = register.json()["api_key"]
+
+    async def chunks():
+        # No Content-Length is sent for a streamed body.
+        yield b"["
+        for index in range(100):
+            yield b'{"sku": "SKU-%d", "price": 1},' % index
+        yield b'{"sku": "last"}]'
+
+    response = await client.post(
+        "/v1/bulk-ingest",
+        content=chunks(),
+        headers={"X-API-Key": api_key, "Content-Type": "application/json"},
+    )
+
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_rejects_non_array_body(client):
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-shape-{uuid.uuid4()}@example.com",
+            "org_name": "Shape Org",
+            "distributor_id": "dist_bulk_shape",
+            "password": "StrongPass123",
+        },
+    )
+    headers = {"X-API-Key": register.json()["api_key"]}
+
+    not_array = await client.post("/v1/bulk-ingest", json={"sku": "SKU-1"}, headers=headers)
+    assert not_array.status_code == 422
+    not_objects = await client.post("/v1/bulk-ingest", json=["SKU-1"], headers=headers)
+    assert not_objects.status_code == 422
+    not_json = await client.post(
+        "/v1/bulk-ingest",
+        content=b"[{",
+        headers={**headers, "Content-Type": "application/json"},
+    )
+    assert not_json.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_ndjson(client, session):
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": f"bulk-ndjson-{uuid.uuid4()}@example.com",
+            "org_name": "NDJSON Org",
+            "distributor_id": "dist_bulk_ndjson",
+            "password": "StrongPass123",
+        },
+    )
+    headers = {"X-API-Key": register.json()["api_key"], "Content-Type": "application/x-ndjson"}
+    client_id = UUID(register.json()["client_id"])
+
+    async def body():
+        # Chunk boundaries fall mid-line; blank lines are skipped.
+        yield b'{"sku": "SKU-1", "price": 10, "quantity": 5}\n{"sku": "SKU-'
+        yield b'2", "price": 20, "quantity": 1}\n\n'
+        yield b'{"sku": "SKU-1", "price": 11, "quantity": 4}'
+
+    response = await client.post("/v1/bulk-ingest.ndjson", content=body(), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["processed"] == 3
+
+    result = await session.execute(
+        select(StoreItem).where(StoreItem.api_client_id == client_id)
+    )
+    items = {item.data["sku"]: item for item in result.scalars().all()}
+    assert sorted(items) == ["SKU-1", "SKU-2"]
+    assert float(items["SKU-1"].price) == 11
+
+    not_object = await client.post("/v1/bulk-ingest.ndjson", content=b'["SKU-1"]\n', headers=headers)
+    assert not_object.status_code == 422
+    not_json = await client.post("/v1/bulk-ingest.ndjson", content=b'{"sku": \n', headers=headers)
+    assert not_json.status_code == 422
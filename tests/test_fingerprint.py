@@ -0,0 +1,30 @@
+import pytest
+
+from app.crud import _build_rows
+from app.utils import compute_fingerprint, make_fingerprinter
+
+# Stored fingerprints are the (api_client_id, fingerprint) conflict key, so these
+# must only change together with a migration that rewrites existing rows.
+# blake2b-128 of b'{"sku":"A"}' and b'{"price":3,"quantity":5,"sku":"B"}'.
+UNMAPPED = ({"sku": "A", "price": 1, "quantity": 2}, None, None, "cf6dbc93b08cf6b8f9553f7efd2c641a")
+MAPPED = (
+    {"quantity": 5, "sku": "B", "cost": 4, "price": 3, "stock": 9},
+    "cost",
+    "stock",
+    "4a63fad26ec941a3919a39d6221d5316",
+)
+
+
+@pytest.mark.parametrize("payload, price_field, quantity_field, expected", [UNMAPPED, MAPPED])
+def test_fingerprint_matches_reference(payload, price_field, quantity_field, expected):
+    assert make_fingerprinter(price_field, quantity_field)(payload) == expected
+    assert compute_fingerprint(payload, price_field, quantity_field) == expected
+
+    rows, processed = _build_rows("client", [payload], quantity_field, price_field)
+    assert processed == 1
+    assert list(rows) == [expected]
+
+
+def test_fingerprint_ignores_key_order():
+    fingerprint = make_fingerprinter()
+    assert fingerprint({"sku": "A", "lot": 1, "price": 2}) == fingerprint({"lot": 1, "price": 9, "sku": "A"})
@@ -1,7 +1,6 @@
 import uuid
 
 import pytest
-from fastapi import HTTPException
 
 
 @pytest.mark.asyncio
@@ -33,14 +32,13 @@ async def test_denied_origin(client):
     }
     await client.post("/v1/clients/register", json=payload)
 
-    with pytest.raises(HTTPException) as exc:
-        await client.post(
-            "/v1/auth/token",
-            json={"email": payload["email"], "password": payload["password"]},
-            headers={"origin": "https://evil.com"},
-        )
+    response = await client.post(
+        "/v1/auth/token",
+        json={"email": payload["email"], "password": payload["password"]},
+        headers={"origin": "https://evil.com"},
+    )
 
-    assert exc.value.status_code == 403
+    assert response.status_code == 403
 
 
 @pytest.mark.asyncio
@@ -81,6 +79,25 @@ async def test_allowed_host_token(client):
     assert response.status_code == 200
 
 
+@pytest.mark.asyncio
+async def test_allowed_host_with_port(client):
+    payload = {
+        "email": f"host-port-{uuid.uuid4()}@example.com",
+        "org_name": "Host Port Org",
+        "distributor_id": "dist_host_port",
+        "password": "StrongPass123",
+    }
+    register = await client.post("/v1/clients/register", json=payload)
+    assert register.status_code == 200
+
+    response = await client.post(
+        "/v1/auth/token",
+        json={"email": payload["email"], "password": payload["password"]},
+        headers={"host": "app.usepharmacyos.com:8443"},
+    )
+    assert response.status_code == 200
+
+
 @pytest.mark.asyncio
 async def test_denied_host(client):
     payload = {
@@ -91,14 +108,13 @@ async def test_denied_host(client):
     }
     await client.post("/v1/clients/register", json=payload)
 
-    with pytest.raises(HTTPException) as exc:
-        await client.post(
-            "/v1/auth/token",
-            json={"email": payload["email"], "password": payload["password"]},
-            headers={"host": "evil.com"},
-        )
+    response = await client.post(
+        "/v1/auth/token",
+        json={"email": payload["email"], "password": payload["password"]},
+        headers={"host": "evil.com"},
+    )
 
-    assert exc.value.status_code == 403
+    assert response.status_code == 403
 
 
 @pytest.mark.asyncio
@@ -117,4 +133,10 @@ async def test_bulk_ingest_ignores_host(client):
         json=[{"sku": "HOST-SKU"}],
         headers={"host": "evil.com", "X-API-Key": api_key},
     )
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/docs", "/redoc", "/openapi.json"])
+async def test_docs_ignore_host_and_origin(client, path):
+    response = await client.get(path, headers={"host": "evil.com", "origin": "https://evil.com"})
+    assert response.status_code == 200
@@ -1,6 +1,12 @@
 import uuid
+from datetime import UTC, datetime, timedelta
 
 import pytest
+from sqlalchemy import update
+
+from app import main
+from app.email_service import get_email_service
+from app.models import PasswordResetToken
 
 
 @pytest.mark.asyncio
@@ -38,4 +44,119 @@ async def test_password_reset_flow(client):
         json={"email": email, "password": new_password},
     )
     assert token_response.status_code == 200
-    assert "access_token" in token_response.json()
\ No newline at end of file
+    assert "access_token" in token_response.json()
+
+@pytest.mark.asyncio
+async def test_password_reset_request_for_unknown_email_looks_successful(client):
+    response = await client.post(
+        "/v1/auth/password-reset/request",
+        json={"email": f"nobody-{uuid.uuid4()}@example.com"},
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_password_reset_token_is_single_use(client):
+    email = f"reset-once-{uuid.uuid4()}@example.com"
+    await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Reset Once Org",
+            "distributor_id": "dist_reset_once",
+            "password": "StrongPass123",
+        },
+    )
+    reset_request = await client.post("/v1/auth/password-reset/request", json={"email": email})
+    reset_token = reset_request.json()["reset_token"]
+
+    first = await client.post(
+        "/v1/auth/password-reset/confirm",
+        json={"reset_token": reset_token, "new_password": "NewStrongPass456"},
+    )
+    assert first.status_code == 200
+    second = await client.post(
+        "/v1/auth/password-reset/confirm",
+        json={"reset_token": reset_token, "new_password": "OtherStrongPass789"},
+    )
+    assert second.status_code == 401
+
+    token_response = await client.post(
+        "/v1/auth/token",
+        json={"email": email, "password": "NewStrongPass456"},
+    )
+    assert token_response.status_code == 200
+
+
+class _RecordingEmailService:
+    def __init__(self):
+        self.sent = []
+
+    async def send_reset_email(self, to_email, user_name, token):
+        self.sent.append((to_email, user_name, token))
+
+
+@pytest.mark.asyncio
+async def test_password_reset_request_sends_email(client):
+    app = client._transport.app
+    email_service = _RecordingEmailService()
+    app.dependency_overrides[get_email_service] = lambda: email_service
+    email = f"reset-mail-{uuid.uuid4()}@example.com"
+    await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Reset Mail Org",
+            "distributor_id": "dist_reset_mail",
+            "password": "StrongPass123",
+        },
+    )
+
+    response = await client.post("/v1/auth/password-reset/request", json={"email": email})
+    assert response.status_code == 200
+    assert email_service.sent == [(email, "Reset Mail Org", response.json()["reset_token"])]
+
+    await client.post(
+        "/v1/auth/password-reset/request", json={"email": f"nobody-{uuid.uuid4()}@example.com"}
+    )
+    assert len(email_service.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_password_reset_rejects_expired_token(client, session):
+    email = f"reset-expired-{uuid.uuid4()}@example.com"
+    await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Reset Expired Org",
+            "distributor_id": "dist_reset_expired",
+            "password": "StrongPass123",
+        },
+    )
+    reset_request = await client.post("/v1/auth/password-reset/request", json={"email": email})
+    reset_token = reset_request.json()["reset_token"]
+    await session.execute(
+        update(PasswordResetToken).values(created_at=datetime.now(UTC) - timedelta(days=1))
+    )
+    await session.commit()
+
+    response = await client.post(
+        "/v1/auth/password-reset/confirm",
+        json={"reset_token": reset_token, "new_password": "NewStrongPass456"},
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_password_reset_unknown_token_skips_hashing(client, monkeypatch):
+    async def fail_hash(hasher, password):
+        raise AssertionError("hashed a password for an unknown token")
+
+    monkeypatch.setattr(main, "hash_password_async", fail_hash)
+    response = await client.post(
+        "/v1/auth/password-reset/confirm",
+        json={"reset_token": "made-up-token", "new_password": "NewStrongPass456"},
+    )
+    assert response.status_code == 401
@@ -0,0 +1,80 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.requests import Request
+
+from app.rate_limit import RateLimiter
+
+
+class _FakeRedis:
+    """Stands in for redis.asyncio: register_script returns the INCR script callable."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.counts = {}
+
+    def register_script(self, script):
+        return self._incr
+
+    async def _incr(self, keys, args):
+        if self.fail:
+            raise RedisConnectionError("connection refused")
+        self.counts[keys[0]] = self.counts.get(keys[0], 0) + 1
+        return self.counts[keys[0]]
+
+
+def _request(headers=()):
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in headers]
+    return Request({"type": "http", "headers": raw_headers, "client": ("203.0.113.7", 1234)})
+
+
+@pytest.mark.asyncio
+async def test_redis_rate_limit_returns_429_with_retry_after(test_settings):
+    settings = test_settings.model_copy(update={"rate_limit_requests": 2})
+    redis = _FakeRedis()
+    limiter = RateLimiter(settings, redis=redis)
+
+    assert await limiter.check(_request(), session=None) is None
+    assert await limiter.check(_request(), session=None) is None
+    retry_after = await limiter.check(_request(), session=None)
+
+    assert 1 <= retry_after <= settings.rate_limit_window_seconds
+    assert list(redis.counts.values()) == [3]
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_in_process_counts(test_settings, caplog):
+    settings = test_settings.model_copy(update={"rate_limit_requests": 2})
+    limiter = RateLimiter(settings, redis=_FakeRedis(fail=True))
+
+    assert await limiter.check(_request(), session=None) is None
+    assert await limiter.check(_request(), session=None) is None
+
+    assert await limiter.check(_request(), session=None) is not None
+    assert "Redis rate limiting unavailable" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_request_gets_429_with_retry_after(make_client):
+    client = await make_client(rate_limit_requests=1)
+
+    await client.post("/v1/auth/token", json={"email": "nobody@example.com", "password": "x"})
+    response = await client.post("/v1/auth/token", json={"email": "nobody@example.com", "password": "x"})
+
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_forwarded_for_is_ignored_by_default(test_settings):
+    limiter = RateLimiter(test_settings)
+    request = _request([("X-Forwarded-For", "198.51.100.1")])
+
+    assert limiter._get_ip(request) == "203.0.113.7"
+
+
+def test_trusted_forwarded_for_uses_last_hop(test_settings):
+    limiter = RateLimiter(test_settings.model_copy(update={"trust_forwarded": True}))
+    request = _request([("X-Forwarded-For", "198.51.100.1, 10.0.0.1, 192.0.2.9")])
+
+    assert limiter._get_ip(request) == "192.0.2.9"
+    assert limiter._get_ip(_request()) == "203.0.113.7"
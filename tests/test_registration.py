@@ -1,6 +1,12 @@
+import asyncio
+import hashlib
 import uuid
 
 import pytest
+from sqlalchemy import select, update
+
+from app.auth import LEGACY_PASSWORD_PREFIX
+from app.models import ApiClient
 
 
 @pytest.mark.asyncio
@@ -68,3 +74,106 @@ async def test_api_key_reset(client):
         json={"email": email, "password": password},
     )
     assert second_reset.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_legacy_password_hash_is_rehashed_on_login(client, session):
+    email = f"legacy-{uuid.uuid4()}@example.com"
+    password = "StrongPass123"
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Legacy Org",
+            "distributor_id": "dist_legacy",
+            "password": password,
+        },
+    )
+    assert register.status_code == 200
+
+    salt = "legacy-salt"
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 200_000).hex()
+    await session.execute(
+        update(ApiClient)
+        .where(ApiClient.email == email)
+        .values(password_hash=f"{LEGACY_PASSWORD_PREFIX}200000${salt}${digest}")
+    )
+    await session.commit()
+
+    response = await client.post("/v1/auth/token", json={"email": email, "password": password})
+    assert response.status_code == 200
+
+    result = await session.execute(
+        select(ApiClient.password_hash).where(ApiClient.email == email)
+    )
+    assert result.scalar_one().startswith("$argon2id$")
+
+
+@pytest.mark.asyncio
+async def test_api_key_reset_revokes_cached_key(client):
+    email = f"reset-cache-{uuid.uuid4()}@example.com"
+    password = "StrongPass123"
+    register = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Key Cache Org",
+            "distributor_id": "dist_reset_cache",
+            "password": password,
+        },
+    )
+    old_key = register.json()["api_key"]
+
+    warm = await client.post("/v1/bulk-ingest", json=[{"sku": "A"}], headers={"X-API-Key": old_key})
+    assert warm.status_code == 200
+
+    reset = await client.post("/v1/auth/api-key/reset", json={"email": email, "password": password})
+    assert reset.status_code == 200
+    new_key = reset.json()["api_key"]
+
+    stale = await client.post("/v1/bulk-ingest", json=[{"sku": "A"}], headers={"X-API-Key": old_key})
+    assert stale.status_code == 401
+    fresh = await client.post("/v1/bulk-ingest", json=[{"sku": "A"}], headers={"X-API-Key": new_key})
+    assert fresh.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_concurrent_api_key_resets_rotate_once(client):
+    email = f"reset-race-{uuid.uuid4()}@example.com"
+    password = "StrongPass123"
+    await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Reset Race Org",
+            "distributor_id": "dist_reset_race",
+            "password": password,
+        },
+    )
+
+    responses = await asyncio.gather(
+        *[
+            client.post("/v1/auth/api-key/reset", json={"email": email, "password": password})
+            for _ in range(2)
+        ]
+    )
+    assert sorted(response.status_code for response in responses) == [200, 429]
+
+
+@pytest.mark.asyncio
+async def test_password_hash_cost_follows_app_settings(make_client, session):
+    client = await make_client(argon2_time_cost=1, argon2_memory_cost_kib=8192)
+    email = f"argon-{uuid.uuid4()}@example.com"
+    response = await client.post(
+        "/v1/clients/register",
+        json={
+            "email": email,
+            "org_name": "Argon Org",
+            "distributor_id": f"dist_{uuid.uuid4().hex[:8]}",
+            "password": "StrongPass123",
+        },
+    )
+    assert response.status_code == 200
+
+    result = await session.execute(select(ApiClient.password_hash).where(ApiClient.email == email))
+    assert "$m=8192,t=1," in result.scalar_one()